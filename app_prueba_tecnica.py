@@ -4,142 +4,36 @@
 # Autor: ChatGPT
 # Uso: streamlit run app_prueba_tecnica.py
 
-import os, re, io, json, time, sqlite3, unicodedata, textwrap
-from datetime import datetime
-import pandas as pd
+import os, re, json, time, textwrap
 import streamlit as st
 
+import autosave, perf, storage, warmup
+
 APP_TITLE = "🧪 Prueba Técnica — Excel, Python, SQL"
 EXCEL_QUIZ_FILE = "Cuestionario_Prueba_Tecnica.xlsx"
 DB_FILE = "quiz.db"
 ADMIN_KEY = st.secrets.get("ADMIN_KEY", os.environ.get("ADMIN_KEY", "admin123"))
 
+_script_t0 = time.perf_counter()
+# Esquema, banco y workers de calificación se preparan en segundo plano (una vez por proceso)
+# mientras se dibuja el registro; pandas y el Excel no se cargan en este hilo antes de eso.
+warmup.start(DB_FILE, EXCEL_QUIZ_FILE)
 st.set_page_config(page_title=APP_TITLE, layout="wide")
 st.title(APP_TITLE)
 st.caption("Registro de candidatos, ejecución de prueba sin revelar respuestas y tablero administrador con resultados.")
 
-# ---------------- Utilidades ----------------
-def norm_text(s: str) -> str:
-    if not isinstance(s, str):
-        return ""
-    s = s.strip()
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
-    return s.upper()
-
-@st.cache_data
-def load_questions(path: str):
-    xls = pd.ExcelFile(path)
-    preguntas = pd.read_excel(xls, "Preguntas")
-    preguntas["id"] = preguntas["id"].astype(int)
-    preguntas["categoria"] = preguntas["categoria"].astype(str)
-    preguntas["tipo"] = preguntas["tipo"].astype(str)
-    preguntas["puntos"] = preguntas["puntos"].astype(int)
-    preguntas["enunciado"] = preguntas["enunciado"].astype(str)
-    preguntas["opciones"] = preguntas["opciones"].fillna("")
-    preguntas["respuesta_correcta"] = preguntas["respuesta_correcta"].fillna("")
-    return preguntas
-
-def ensure_db():
-    con = sqlite3.connect(DB_FILE, check_same_thread=False)
-    cur = con.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS users(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT, email TEXT, doc TEXT,
-        role TEXT,  -- 'candidato' o 'administrador'
-        created_at TEXT
-    )""")
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS submissions(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        started_at TEXT,
-        finished_at TEXT,
-        duration_sec REAL,
-        score_total REAL,
-        FOREIGN KEY(user_id) REFERENCES users(id)
-    )""")
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS answers(
-        submission_id INTEGER,
-        qid INTEGER,
-        response_text TEXT,
-        is_correct INTEGER,
-        score_awarded REAL,
-        FOREIGN KEY(submission_id) REFERENCES submissions(id)
-    )""")
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS coding(
-        submission_id INTEGER,
-        task_type TEXT,   -- 'PY' o 'SQL'
-        task_id INTEGER,
-        passed_tests INTEGER,
-        total_tests INTEGER,
-        details TEXT,
-        score_awarded REAL,
-        FOREIGN KEY(submission_id) REFERENCES submissions(id)
-    )""")
-    # Borradores (auto-guardado)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS draft_answers(
-        user_id INTEGER,
-        qid INTEGER,
-        response_text TEXT,
-        updated_at TEXT,
-        PRIMARY KEY(user_id, qid)
-    )""")
-    con.commit()
-    return con
-
-def save_drafts(con, user_id: int, answers: dict):
-    cur = con.cursor()
-    now = datetime.utcnow().isoformat()
-    for qid, resp in answers.items():
-        cur.execute("""
-            INSERT INTO draft_answers(user_id, qid, response_text, updated_at)
-            VALUES (?,?,?,?)
-            ON CONFLICT(user_id, qid) DO UPDATE SET response_text=excluded.response_text, updated_at=excluded.updated_at
-        """, (user_id, int(qid), str(resp), now))
-    con.commit()
-
-def load_drafts(con, user_id: int) -> dict:
-    cur = con.cursor()
-    rows = cur.execute("SELECT qid, response_text FROM draft_answers WHERE user_id=?", (user_id,)).fetchall()
-    return {int(qid): resp for (qid, resp) in rows}
-
-def score_formula(user_input: str, golden_variants: list) -> bool:
-    u = norm_text(user_input).replace(" ", "")
-    for g in golden_variants:
-        v = norm_text(g).replace(" ", "")
-        if u == v:
-            return True
-    return False
-
-def get_golden_variants(resp_correcta: str):
-    parts = [p.strip() for p in str(resp_correcta).split("|") if p.strip()]
-    return parts
-
 # ---------------- Carga de preguntas ----------------
 if not os.path.exists(EXCEL_QUIZ_FILE):
     st.error(f"No se encuentra {EXCEL_QUIZ_FILE}. Sube el archivo desde la barra lateral.")
 else:
     st.success(f"Plantilla detectada: {EXCEL_QUIZ_FILE}")
 
-with st.sidebar:
-    st.header("⚙️ Configuración")
-    up = st.file_uploader("Subir nueva plantilla Excel (opcional)", type=["xlsx"])
-    if up:
-        with open(EXCEL_QUIZ_FILE, "wb") as f:
-            f.write(up.read())
-        st.success("Plantilla reemplazada.")
-
-    st.markdown("**Admin Key**: configura `ADMIN_KEY` en *Secrets* o variable de entorno.")
-
-preguntas = load_questions(EXCEL_QUIZ_FILE)
-con = ensure_db()
-
 # ---------------- Registro ----------------
+# Solo necesita las pruebas abiertas (las elige el administrador); en el primer arranque la lista puede
+# estar vacía todavía (el banco base se registra al terminar de cargar) y se usa la vigente.
+# Las conexiones salen del pool del proceso solo mientras se consulta (WAL; migración una vez por proceso).
+with perf.timer("db_connect"), storage.connection(DB_FILE) as con:
+    open_banks = storage.list_banks(con, active_only=True)
 st.subheader("🪪 Registro")
 with st.form("registro"):
     col1, col2, col3 = st.columns(3)
@@ -147,45 +41,158 @@ with st.form("registro"):
     email = col2.text_input("Correo", key="email")
     doc = col3.text_input("Documento/N° ID", key="doc")
     role = st.selectbox("Rol", ["candidato", "administrador"], key="role")
+    labels = {v: f"{label} · {v[:8]}" for v, label, _ in open_banks}
+    bank_choice = (st.selectbox("Prueba", list(labels), format_func=labels.get, key="bank_choice") if len(open_banks) > 1
+                   else open_banks[0][0] if open_banks else None)
     key_admin = st.text_input("Admin key (si es administrador)", type="password", key="adminkey") if role == "administrador" else ""
     start = st.form_submit_button("Ingresar")
+perf.record("render.registro", time.perf_counter() - _script_t0)
+
+# ---------------- Banco de preguntas ----------------
+# Bancos compilados: cada versión se identifica por el hash del archivo y convive con las demás;
+# los arranques siguientes leen el snapshot en vez de parsear el Excel.
+with perf.timer("warmup.wait"):
+    base_bank = warmup.wait()
+# Estos módulos cargan pandas; el hilo de precalentamiento ya los importó
+import grading, question_bank, scoring, submissions
+
+# Si el Excel cambia con la app corriendo se toma la nueva versión (load_bank solo hace stat si no cambió)
+if os.path.exists(EXCEL_QUIZ_FILE):
+    with perf.timer("load_bank"):
+        base_bank = question_bank.load_bank(EXCEL_QUIZ_FILE)
+    storage.register_bank(DB_FILE, base_bank.version, EXCEL_QUIZ_FILE)
+
+with st.sidebar:
+    st.header("⚙️ Configuración")
+    up = st.file_uploader("Subir nueva plantilla Excel (opcional)", type=["xlsx"])
+    if up:
+        # El archivo queda en el uploader en cada rerun: solo se compila y registra cuando cambia
+        if st.session_state.get("uploaded_bank", (None,))[0] != up.file_id:
+            with perf.timer("load_bank"):
+                added = question_bank.add_bank(up.getvalue())
+            storage.register_bank(DB_FILE, added.version, up.name)
+            st.session_state["uploaded_bank"] = (up.file_id, added.version)
+        st.success(f"Plantilla agregada: {up.name} (versión {st.session_state['uploaded_bank'][1][:8]}). "
+                   "Las pruebas en curso conservan la versión con la que empezaron.")
+
+    st.markdown("**Admin Key**: configura `ADMIN_KEY` en *Secrets* o variable de entorno.")
+
+# La versión más reciente es la vigente; cada candidato queda fijo a la que eligió al registrarse
+with storage.connection(DB_FILE) as con:
+    banks = storage.list_banks(con)
+current_bank = question_bank.get_bank(banks[0][0]) or base_bank
+bank = current_bank
+if st.session_state.get("bank_version"):
+    bank = question_bank.get_bank(st.session_state["bank_version"]) or current_bank
+preguntas = bank.preguntas
 
 if start:
     if role == "administrador":
         if key_admin != ADMIN_KEY:
             st.error("Admin key inválida.")
         else:
-            cur = con.cursor()
-            cur.execute("INSERT INTO users(name,email,doc,role,created_at) VALUES (?,?,?,?,?)",
-                        (name or "Admin", email or "admin@example.com", doc or "-", "administrador", datetime.utcnow().isoformat()))
-            con.commit()
             st.session_state["is_admin"] = True
-            st.session_state["admin_user_id"] = cur.lastrowid
+            with storage.connection(DB_FILE) as con:
+                st.session_state["admin_user_id"] = storage.insert_user(
+                    con, name or "Admin", email or "admin@example.com", doc or "-", "administrador")
             st.success("Bienvenido, Administrador.")
     else:
         if not name or not email or not doc:
             st.error("Complete nombre, correo y documento.")
         else:
-            cur = con.cursor()
-            cur.execute("INSERT INTO users(name,email,doc,role,created_at) VALUES (?,?,?,?,?)",
-                        (name, email, doc, "candidato", datetime.utcnow().isoformat()))
-            con.commit()
-            st.session_state["user_id"] = cur.lastrowid
+            with storage.connection(DB_FILE) as con:
+                st.session_state["user_id"] = storage.insert_user(con, name, email, doc, "candidato")
+            bank = question_bank.get_bank(bank_choice) if bank_choice else current_bank
+            bank = bank or current_bank
+            st.session_state["bank_version"] = bank.version
+            preguntas = bank.preguntas
             st.session_state["started_at"] = time.time()
             st.session_state.setdefault("buffer_answers", {})
             st.success("Registro exitoso. ¡Puedes iniciar la prueba!")
 
 # ---------------- Prefill de borradores ----------------
 def prefill_from_drafts(user_id: int):
-    drafts = load_drafts(con, user_id)
+    with storage.connection(DB_FILE) as con:
+        drafts = storage.load_drafts(con, user_id)
     st.session_state.setdefault("buffer_answers", {})
     st.session_state["buffer_answers"].update(drafts)
+    st.session_state["draft_tracker"] = autosave.DraftTracker(drafts)
 
 if st.session_state.get("user_id") and "prefilled" not in st.session_state:
     prefill_from_drafts(st.session_state["user_id"])
     st.session_state["prefilled"] = True
 
 # ---------------- UI de la prueba (sin feedback) ----------------
+# Cada grupo de preguntas es un fragmento: un clic en un radio solo re-ejecuta su grupo.
+@perf.timed("autosave.enqueue")
+def autosave_changes():
+    buffer = st.session_state.setdefault("buffer_answers", {})
+    tracker = st.session_state.setdefault("draft_tracker", autosave.DraftTracker())
+    changes = tracker.changes(buffer)
+    if changes:
+        autosave.enqueue(DB_FILE, st.session_state["user_id"], changes)
+        tracker.mark_sent(changes)
+
+@st.fragment
+@perf.timed("render.mcq_group")
+def mcq_group(items: list):
+    buffer = st.session_state["buffer_answers"]
+    for item in items:
+        st.write(f"**[{item.id}]** {item.enunciado}")
+        saved = buffer.get(item.id, "")
+        choice = st.radio(
+            "Selecciona una opción:",
+            item.opciones,
+            index=item.letra_idx.get(saved.strip().upper()[:1]) if saved else None,
+            key=f"q_{item.id}_mcq"
+        )
+        if choice:
+            buffer[item.id] = choice[:1]
+        st.divider()
+    autosave_changes()
+
+@st.fragment
+@perf.timed("render.formula_group")
+def formula_group(items: list):
+    buffer = st.session_state["buffer_answers"]
+    for item in items:
+        qkey = f"q_{item.id}_formula"
+        st.write(f"**[{item.id}]** {item.enunciado}")
+        if qkey not in st.session_state and item.id in buffer:
+            st.session_state[qkey] = buffer[item.id]
+        buffer[item.id] = st.text_input("Tu fórmula:", key=qkey, placeholder="Ej: SUMAR.SI.CONJUNTO(...)", label_visibility="visible")
+        st.divider()
+    autosave_changes()
+
+def code_area(qid: int, key: str, label: str, height: int, placeholder: str):
+    buffer = st.session_state["buffer_answers"]
+    if key not in st.session_state and qid in buffer:
+        st.session_state[key] = buffer[qid]
+    buffer[qid] = st.text_area(label, height=height, key=key, placeholder=placeholder)
+
+@st.fragment
+@perf.timed("render.python_practice")
+def python_practice():
+    st.write("**[301]** Implementa `fizzbuzz(n)` según enunciado.")
+    code_area(301, "code_301", "Tu código (define fizzbuzz):", 180, "def fizzbuzz(n):\n    # tu código aquí\n    ...")
+    st.write("**[302]** Implementa `flatten_list(lst)` para aplanar listas anidadas.")
+    code_area(302, "code_302", "Tu código (define flatten_list):", 200, "def flatten_list(lst):\n    # tu código aquí\n    ...")
+    autosave_changes()
+
+@st.fragment
+@perf.timed("render.sql_practice")
+def sql_practice():
+    code_area(501, "sql_501", "**[501]** TOP 3 clientes por total vendido (customer, total):", 160, "-- Escribe aquí tu SQL")
+    code_area(502, "sql_502", "**[502]** Total vendido por mes 2024 (mes YYYY-MM, total):", 160, "-- Escribe aquí tu SQL")
+    autosave_changes()
+
+@st.fragment(run_every=2)
+def submission_status(receipt: str):
+    estado = submissions.status(receipt, DB_FILE)
+    st.caption(f"Recibo `{receipt[:12]}` · Estado: ⏳ {estado['estado']}")
+    if estado["estado"] == submissions.GRADED:
+        st.rerun()
+
 if st.session_state.get("user_id"):
     st.markdown("---")
     st.subheader("📋 Prueba (no se muestran respuestas correctas)")
@@ -194,133 +201,38 @@ if st.session_state.get("user_id"):
     buffer = st.session_state.setdefault("buffer_answers", {})
 
     # ---- Excel ----
-    with tabs[0]:
+    with tabs[0], perf.timer("render.tab_excel"):
         st.markdown("### Preguntas de Excel")
-        excel_mcq = preguntas[(preguntas["categoria"]=="Excel") & (preguntas["tipo"]=="MCQ")]
-        excel_form = preguntas[(preguntas["categoria"]=="Excel") & (preguntas["tipo"]=="FORMULA_EXCEL")]
-
-        for _, row in excel_mcq.iterrows():
-            qkey = f"q_{row.id}_mcq"
-            st.write(f"**[{row.id}]** {row.enunciado}")
-            opciones = [o.strip() for o in str(row.opciones).split("|") if o.strip()]
-            saved = buffer.get(row.id, "")
-            saved_idx = None
-            if saved:
-                for i, opt in enumerate(opciones):
-                    if opt.upper().startswith(saved.upper()[:1] + ")"):
-                        saved_idx = i
-                        break
-            choice = st.radio(
-                "Selecciona una opción:",
-                opciones,
-                index=saved_idx if saved_idx is not None else None,
-                key=qkey,
-                horizontal=False
-            )
-            if choice:
-                buffer[row.id] = choice[:1]
-            st.divider()
-
+        mcq_group(bank.group("Excel", "MCQ"))
         st.markdown("### Fórmulas (ingresa solo la fórmula)")
-        for _, row in excel_form.iterrows():
-            qkey = f"q_{row.id}_formula"
-            st.write(f"**[{row.id}]** {row.enunciado}")
-            if qkey not in st.session_state and row.id in buffer:
-                st.session_state[qkey] = buffer[row.id]
-            ans = st.text_input("Tu fórmula:", key=qkey, placeholder="Ej: SUMAR.SI.CONJUNTO(...)", label_visibility="visible")
-            buffer[row.id] = ans
-            st.divider()
+        formula_group(bank.group("Excel", "FORMULA_EXCEL"))
 
     # ---- Python ----
-    with tabs[1]:
+    with tabs[1], perf.timer("render.tab_python"):
         st.markdown("### Preguntas de Python")
-        py_mcq = preguntas[(preguntas["categoria"]=="Python") & (preguntas["tipo"]=="MCQ")]
-        for _, row in py_mcq.iterrows():
-            qkey = f"q_{row.id}_mcq"
-            st.write(f"**[{row.id}]** {row.enunciado}")
-            opciones = [o.strip() for o in str(row.opciones).split("|") if o.strip()]
-            saved = buffer.get(row.id, "")
-            saved_idx = None
-            if saved:
-                for i, opt in enumerate(opciones):
-                    if opt.upper().startswith(saved.upper()[:1] + ")"):
-                        saved_idx = i
-                        break
-            choice = st.radio(
-                "Selecciona una opción:",
-                opciones,
-                index=saved_idx if saved_idx is not None else None,
-                key=qkey
-            )
-            if choice:
-                buffer[row.id] = choice[:1]
-            st.divider()
-
+        mcq_group(bank.group("Python", "MCQ"))
         st.markdown("### Prácticas de Python (escribe tu solución)")
-        st.write("**[301]** Implementa `fizzbuzz(n)` según enunciado.")
-        key301 = "code_301"
-        if key301 not in st.session_state and 301 in buffer:
-            st.session_state[key301] = buffer[301]
-        code_301 = st.text_area("Tu código (define fizzbuzz):", height=180, key=key301,
-                                placeholder="def fizzbuzz(n):\n    # tu código aquí\n    ...")
-        buffer[301] = code_301
-
-        st.write("**[302]** Implementa `flatten_list(lst)` para aplanar listas anidadas.")
-        key302 = "code_302"
-        if key302 not in st.session_state and 302 in buffer:
-            st.session_state[key302] = buffer[302]
-        code_302 = st.text_area("Tu código (define flatten_list):", height=200, key=key302,
-                                placeholder="def flatten_list(lst):\n    # tu código aquí\n    ...")
-        buffer[302] = code_302
-
+        python_practice()
         st.caption("Nota: No se muestran resultados de tests durante la prueba. El administrador verá el puntaje posteriormente.")
 
     # ---- SQL ----
-    with tabs[2]:
+    with tabs[2], perf.timer("render.tab_sql"):
         st.markdown("### Preguntas de SQL")
-        sql_mcq = preguntas[(preguntas["categoria"]=="SQL") & (preguntas["tipo"]=="MCQ")]
-        for _, row in sql_mcq.iterrows():
-            qkey = f"q_{row.id}_mcq"
-            st.write(f"**[{row.id}]** {row.enunciado}")
-            opciones = [o.strip() for o in str(row.opciones).split("|") if o.strip()]
-            saved = buffer.get(row.id, "")
-            saved_idx = None
-            if saved:
-                for i, opt in enumerate(opciones):
-                    if opt.upper().startswith(saved.upper()[:1] + ")"):
-                        saved_idx = i
-                        break
-            choice = st.radio(
-                "Selecciona una opción:",
-                opciones,
-                index=saved_idx if saved_idx is not None else None,
-                key=qkey
-            )
-            if choice:
-                buffer[row.id] = choice[:1]
-            st.divider()
-
+        mcq_group(bank.group("SQL", "MCQ"))
         st.markdown("### Prácticas de SQL (escribe tu consulta)")
-        st.caption("Describe tus consultas. Serán evaluadas por el administrador.")
-        key501 = "sql_501"
-        if key501 not in st.session_state and 501 in buffer:
-            st.session_state[key501] = buffer[501]
-        code_501 = st.text_area("**[501]** TOP 3 clientes por total vendido (customer, total):", height=160, key=key501,
-                                placeholder="-- Escribe aquí tu SQL")
-        buffer[501] = code_501
-
-        key502 = "sql_502"
-        if key502 not in st.session_state and 502 in buffer:
-            st.session_state[key502] = buffer[502]
-        code_502 = st.text_area("**[502]** Total vendido por mes 2024 (mes YYYY-MM, total):", height=160, key=key502,
-                                placeholder="-- Escribe aquí tu SQL")
-        buffer[502] = code_502
+        st.caption("Escribe una sola consulta SELECT por ejercicio. Se ejecutará sobre las tablas de ejemplo (customers, orders, order_items).")
+        sql_practice()
 
     # ---- Guardado y Envío ----
+    # Auto-guardado: solo se encolan las preguntas que cambiaron; el hilo de fondo las escribe con debounce
+    autosave_changes()
+
     colg1, colg2 = st.columns([1,1])
     if colg1.button("💾 Guardar progreso"):
-        save_drafts(con, st.session_state["user_id"], buffer)
+        with perf.timer("autosave.flush"):
+            autosave.flush(DB_FILE, st.session_state["user_id"])
         st.success("Progreso guardado. Puedes cerrar y volver luego para continuar.")
+    st.caption("Tu progreso también se guarda automáticamente mientras respondes.")
 
     if colg2.button("📤 Enviar prueba", type="primary"):
         user_id = st.session_state["user_id"]
@@ -328,41 +240,28 @@ if st.session_state.get("user_id"):
         finished_at = time.time()
         duration = finished_at - started_at
 
-        df = preguntas.copy()
-        total_score = 0.0
-        rows_answers = []
-
-        mcq_form = df[df["tipo"].isin(["MCQ","FORMULA_EXCEL"])].copy()
-        for _, row in mcq_form.iterrows():
-            ans = buffer.get(row.id, "")
-            is_ok = 0
-            awarded = 0.0
-            if row["tipo"] == "MCQ":
-                correct = str(row["respuesta_correcta"]).strip().upper()[:1]
-                sel = str(ans).strip().upper()[:1]
-                is_ok = 1 if sel == correct else 0
-                awarded = float(row["puntos"]) if is_ok else 0.0
-            else:
-                golds = [p.strip() for p in str(row["respuesta_correcta"]).split("|") if p.strip()]
-                is_ok = 1 if score_formula(str(ans), golds) else 0
-                awarded = float(row["puntos"]) if is_ok else 0.0
-            total_score += awarded
-            rows_answers.append((row.id, ans, is_ok, awarded))
-
-        cur = con.cursor()
-        cur.execute("INSERT INTO submissions(user_id, started_at, finished_at, duration_sec, score_total) VALUES (?,?,?,?,?)",
-                    (user_id, datetime.utcfromtimestamp(started_at).isoformat(),
-                              datetime.utcfromtimestamp(finished_at).isoformat(),
-                              duration, total_score))
-        sub_id = cur.lastrowid
-        for qid, ans, ok, pts in rows_answers:
-            cur.execute("INSERT INTO answers(submission_id,qid,response_text,is_correct,score_awarded) VALUES (?,?,?,?,?)",
-                        (sub_id, qid, str(ans), int(ok), pts))
-        con.commit()
+        with perf.timer("submit.scoring"):
+            scored = scoring.score_buffer(preguntas, buffer, bank.golden)
+            total_score = float(scored["score_awarded"].sum())
+
+        answers = scored[["qid", "response_text", "is_correct", "score_awarded"]].itertuples(index=False, name=None)
+        # Prácticas de código y SQL: se califican en segundo plano y se guardan en `coding`
+        tasks = grading.build_code_tasks(bank, buffer) + grading.build_sql_tasks(bank, buffer)
+        # La entrega queda en el diario y en la cola de escritura; el hilo escritor la guarda en SQLite
+        with perf.timer("submit.enqueue"):
+            st.session_state["receipt"] = submissions.enqueue(
+                DB_FILE, user_id, started_at, finished_at, total_score, list(answers), tasks, bank.version)
 
         st.success("Entrega registrada. Gracias por completar la prueba.")
         st.info("El administrador verá tu puntaje y comparativo.")
 
+    if st.session_state.get("receipt"):
+        receipt = st.session_state["receipt"]
+        if submissions.status(receipt, DB_FILE)["estado"] == submissions.GRADED:
+            st.caption(f"Recibo `{receipt[:12]}` · Estado: ✅ {submissions.GRADED}")
+        else:
+            submission_status(receipt)
+
 # ---------------- Admin Dashboard ----------------
 st.markdown("---")
 st.subheader("🛡️ Administrador")
@@ -372,87 +271,155 @@ with colA:
     check = st.button("Entrar a Dashboard", key="admin_enter")
 if (check and admin_try == ADMIN_KEY) or st.session_state.get("is_admin"):
     st.session_state["is_admin"] = True
-    con2 = sqlite3.connect(DB_FILE, check_same_thread=False)
-    cur = con2.cursor()
-    st.success("Acceso administrador concedido.")
+    # Solo el dashboard usa estos módulos (xlsxwriter se importa al descargar)
+    import export, grade_cache, item_analysis, maintenance
 
-    # KPI
-    k1, k2, k3, k4 = st.columns(4)
-    total_users = cur.execute("SELECT COUNT(*) FROM users WHERE role='candidato'").fetchone()[0]
-    total_subs  = cur.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
-    avg_score   = cur.execute("SELECT COALESCE(AVG(score_total),0) FROM submissions").fetchone()[0]
-    avg_dur     = cur.execute("SELECT COALESCE(AVG(duration_sec),0) FROM submissions").fetchone()[0]
-    k1.metric("Candidatos", total_users)
-    k2.metric("Entregas", total_subs)
-    k3.metric("Promedio (MCQ+Fórmulas)", round(avg_score,2))
-    k4.metric("Duración Prom. (min)", round(avg_dur/60,2))
-
-    # Datos base
-    df_users = pd.read_sql_query("SELECT * FROM users", con2)
-    df_subs  = pd.read_sql_query("SELECT * FROM submissions", con2)
-    df_ans   = pd.read_sql_query("SELECT * FROM answers", con2)
-    df_code  = pd.read_sql_query("SELECT * FROM coding", con2)
-    preguntas_df = load_questions(EXCEL_QUIZ_FILE)
-
-    if not df_subs.empty:
-        # Conteo buenas/malas
-        if not df_ans.empty:
-            agg = df_ans.groupby("submission_id").agg(
-                buenas=("is_correct", lambda s: int((s==1).sum())),
-                malas=("is_correct", lambda s: int((s==0).sum())),
-                puntos_obtenidos=("score_awarded", "sum")
-            ).reset_index()
-        else:
-            agg = pd.DataFrame(columns=["submission_id","buenas","malas","puntos_obtenidos"])
-
-        if not df_code.empty:
-            code_agg = df_code.groupby("submission_id").agg(
-                tests_ok=("passed_tests", "sum"),
-                tests_total=("total_tests", "sum"),
-                puntos_code=("score_awarded","sum")
-            ).reset_index()
-        else:
-            code_agg = pd.DataFrame(columns=["submission_id","tests_ok","tests_total","puntos_code"])
+    def admin_query(fn, *args, **kwargs):
+        # Cada consulta toma una conexión del pool y la devuelve; también sirve desde el hilo de descarga
+        with storage.connection(DB_FILE) as con:
+            return fn(con, *args, **kwargs)
 
-        df_join = df_subs.merge(df_users, left_on="user_id", right_on="id", suffixes=("_sub","_user"), how="left")
-        df_join = df_join.merge(agg, left_on="id_sub", right_on="submission_id", how="left")
-        df_join = df_join.merge(code_agg, left_on="id_sub", right_on="submission_id", how="left")
-        df_join["tests_ok"] = df_join["tests_ok"].fillna(0).astype(int)
-        df_join["tests_total"] = df_join["tests_total"].fillna(0).astype(int)
-        df_join["puntos_code"] = df_join["puntos_code"].fillna(0.0)
-        df_join["puntos_obtenidos"] = df_join["puntos_obtenidos"].fillna(0.0)
-        df_join["score_total_final"] = df_join["score_total"].fillna(0.0) + df_join["puntos_code"]
+    st.success("Acceso administrador concedido.")
 
+    with st.expander("📂 Pruebas abiertas al registro"):
+        st.caption("Versiones del banco que los candidatos pueden elegir al registrarse; con una sola abierta no se "
+                   "muestra el selector. Al agregar una plantilla nueva queda abierta solo esa.")
+        all_labels = {v: f"{label} · {v[:8]}" for v, label, _ in banks}
+        opened = [v for v, _, _ in admin_query(storage.list_banks, active_only=True)]
+        chosen = st.multiselect("Pruebas abiertas", list(all_labels), default=opened,
+                                format_func=all_labels.get, key="open_banks")
+        if st.button("Guardar pruebas abiertas", key="save_open_banks"):
+            if chosen:
+                admin_query(storage.set_active_banks, chosen)
+                st.success(f"{len(chosen)} prueba(s) abierta(s) al registro.")
+            else:
+                st.warning("Debe quedar al menos una prueba abierta.")
+
+    with st.expander("🔁 Recalificar entregas con la clave actual"):
+        st.caption("Úsalo tras corregir `respuesta_correcta` en el banco: recalcula MCQ/Fórmulas y `score_total` con la clave "
+                   f"de la versión vigente ({current_bank.version[:8]}) para las entregas rendidas con las versiones elegidas "
+                   "(y las anteriores al versionado). La otra opción usa la versión con la que se rindió cada entrega.")
+        bank_labels = {v: f"{label} · {v[:8]}" for v, label, _ in banks}
+        regrade_versions = st.multiselect("Versiones a recalificar con la clave vigente", list(bank_labels),
+                                          default=[current_bank.version] if current_bank.version in bank_labels else [],
+                                          format_func=bank_labels.get, key="regrade_versions")
+        rg1, rg2 = st.columns(2)
+        res = None
+        if rg1.button("Recalificar versiones elegidas", key="regrade_all"):
+            res = admin_query(scoring.regrade_all, current_bank.preguntas, regrade_versions)
+        if rg2.button("Recalificar con la versión original", key="regrade_original"):
+            res = admin_query(scoring.regrade_all)
+        if res:
+            st.success(f"{res['answers']} respuestas revisadas, {res['changed']} cambiaron; {res['submissions']} entregas actualizadas.")
+
+    # KPI (kpi_rollup se mantiene en cada escritura; no se reescanean las tablas)
+    k1, k2, k3, k4 = st.columns(4)
+    with perf.timer("admin.kpis"):
+        kpi = admin_query(storage.kpis)
+    k1.metric("Candidatos", kpi["candidatos"])
+    k2.metric("Entregas", kpi["entregas"])
+    k3.metric("Promedio (MCQ+Fórmulas)", round(kpi["avg_score"],2))
+    k4.metric("Duración Prom. (min)", round(kpi["avg_duration"]/60,2))
+    if submissions.pending_count():
+        st.caption(f"Envíos en cola de escritura: {submissions.pending_count()}")
+    # Las entregas archivadas (maintenance.py) no cuentan en los KPIs; se consultan bajo demanda
+    archived = (os.path.exists(admin_query(storage.archive_path))
+                and st.checkbox("Incluir entregas archivadas en el resumen", key="admin_archived"))
+
+    preguntas_df = current_bank.preguntas
+
+    if kpi["entregas"] or archived:
         st.markdown("### Resumen por candidato")
-        st.dataframe(df_join[[
-            "id_sub","name","email","doc","buenas","malas","puntos_obtenidos","tests_ok","tests_total","score_total_final","duration_sec","started_at","finished_at"
-        ]].rename(columns={"id_sub":"submission_id"}), use_container_width=True)
+        f1, f2, f3 = st.columns([3,1,1])
+        search = f1.text_input("Buscar (nombre, email o documento)", key="admin_search")
+        page_size = f2.selectbox("Filas por página", [25, 50, 100, 250], index=1, key="admin_page_size")
+        with perf.timer("admin.summary"):
+            n_total = admin_query(storage.summary_count, search, archived)
+        n_pages = max(1, -(-n_total // page_size))
+        page = f3.number_input("Página", min_value=1, max_value=n_pages, value=1, step=1, key="admin_page")
+        with perf.timer("admin.summary"):
+            df_page = admin_query(storage.summary_page, search, limit=page_size, offset=(int(page)-1)*page_size,
+                                       archived=archived)
+        st.dataframe(df_page, use_container_width=True)
+        st.caption(f"{n_total} entregas · página {int(page)} de {n_pages}")
 
         with st.expander("Comparativo por pregunta (con respuesta correcta)"):
-            if not df_ans.empty:
-                df_comp = df_ans.merge(preguntas_df[["id","enunciado","categoria","tipo","respuesta_correcta","puntos"]],
-                                       left_on="qid", right_on="id", how="left")
-                st.dataframe(df_comp.sort_values(["submission_id","qid"]), use_container_width=True)
+            sub_sel = st.selectbox("Entrega", df_page["submission_id"].tolist(), key="admin_comp_sub",
+                                   format_func=lambda i: f"#{i} · " + str(df_page.set_index("submission_id").at[i, "name"]))
+            df_sel = admin_query(storage.submission_answers, sub_sel, archived) if sub_sel is not None else None
+            if df_sel is not None and not df_sel.empty:
+                st.dataframe(df_sel.merge(preguntas_df[["id","enunciado","categoria","tipo","respuesta_correcta","puntos"]],
+                                          left_on="qid", right_on="id", how="left"), use_container_width=True)
             else:
                 st.info("Sin respuestas MCQ/Fórmulas registradas.")
 
-        bcol1, bcol2 = st.columns(2)
-        with bcol1:
-            csv = df_join.to_csv(index=False).encode("utf-8")
-            st.download_button("⬇️ Descargar resultados (CSV)", csv, "resultados.csv", "text/csv")
-        with bcol2:
-            out = io.BytesIO()
-            with pd.ExcelWriter(out, engine="xlsxwriter") as writer:
-                df_join.to_excel(writer, sheet_name="Submissions", index=False)
-                if not df_ans.empty:
-                    df_ans.to_excel(writer, sheet_name="Answers", index=False)
-                if 'df_comp' in locals():
-                    df_comp.to_excel(writer, sheet_name="Comparativo", index=False)
-                if not df_code.empty:
-                    df_code.to_excel(writer, sheet_name="Coding", index=False)
-            st.download_button("⬇️ Descargar resultados (XLSX)", out.getvalue(), "resultados.xlsx",
-                               "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        with st.expander("📈 Análisis de ítems (dificultad y discriminación)"):
+            st.caption("p = proporción de aciertos · r_pb = point-biserial corregido (acierto vs. resto de la prueba) · "
+                       f"r_tiempo = correlación acierto/duración. Correlaciones desde {item_analysis.MIN_RESPONSES} respuestas.")
+            with perf.timer("admin.item_analysis"):
+                df_items = admin_query(item_analysis.item_stats, preguntas_df)
+                df_dis = admin_query(item_analysis.distractors, preguntas_df)
+            st.dataframe(df_items, use_container_width=True)
+            if not df_dis.empty:
+                q_dis = st.selectbox("Distractores de la pregunta MCQ", sorted(df_dis["qid"].unique().tolist()), key="admin_dis_q")
+                st.bar_chart(df_dis[df_dis["qid"] == q_dis].assign(opcion=lambda d: d["opcion"].replace("", "(vacía)"))
+                             .set_index("opcion")["n"])
+
+        # Exportación bajo demanda: los callables corren solo al hacer clic (en otro hilo)
+        with st.expander("⬇️ Exportar resultados"):
+            e1, e2, e3 = st.columns(3)
+            date_from = e1.date_input("Enviadas desde", value=None, key="exp_from")
+            date_to = e2.date_input("Hasta", value=None, key="exp_to")
+            ids_txt = e3.text_input("IDs de entrega (ej. 3, 7-12)", key="exp_ids")
+            try:
+                filters = dict(date_from=date_from, date_to=date_to, submission_ids=export.parse_ids(ids_txt))
+            except ValueError:
+                st.error("IDs inválidos: usa números separados por coma o rangos (7-12).")
+                filters = None
+            if filters is not None:
+                bcol1, bcol2 = st.columns(2)
+                with bcol1:
+                    st.download_button("⬇️ Descargar resultados (CSV)",
+                                       perf.timed("export.csv")(lambda: admin_query(export.summary_csv, **filters)),
+                                       "resultados.csv", "text/csv")
+                with bcol2:
+                    st.download_button("⬇️ Descargar resultados (XLSX)",
+                                       perf.timed("export.xlsx")(lambda: admin_query(export.results_xlsx, preguntas_df, **filters)),
+                                       "resultados.xlsx",
+                                       "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
     else:
         st.info("Aún no hay entregas registradas.")
+
+    with st.expander("🧹 Mantenimiento de la base"):
+        st.caption("Borra borradores de quienes ya entregaron, unifica filas de administrador, archiva entregas antiguas "
+                   "en la base de archivo y compacta por tramos. Corre en segundo plano sin bloquear a los candidatos.")
+        m1, m2 = st.columns([1, 2])
+        days = m1.number_input("Archivar entregas de más de (días)", min_value=1,
+                               value=maintenance.ARCHIVE_AFTER_DAYS, step=30, key="maint_days")
+        if m2.button("Ejecutar mantenimiento", key="maint_run"):
+            if not maintenance.start(DB_FILE, int(days)):
+                st.info("Ya hay un mantenimiento en curso.")
+        mst = maintenance.status()
+        if mst["corriendo"]:
+            st.caption("⏳ Mantenimiento en curso…")
+        if mst["ultima"]:
+            st.caption(f"Última corrida ({mst['ultima'][0][:19]}): " +
+                       " · ".join(f"{k}: {v}" for k, v in mst["ultima"][1].items()))
+
+    with st.expander("⏱️ Rendimiento de la app (este proceso)"):
+        df_perf = perf.summary()
+        if df_perf.empty:
+            st.info("Aún no hay mediciones.")
+        else:
+            st.caption(f"Últimas {perf.RING_SIZE} mediciones por proceso. p50/p95 en milisegundos.")
+            st.bar_chart(df_perf.set_index("fase")[["p50_ms", "p95_ms"]], horizontal=True)
+            st.dataframe(df_perf, use_container_width=True)
+            st.download_button("⬇️ Métricas (Prometheus)", perf.prometheus_text, "quiz_metrics.prom", "text/plain")
+        gc = admin_query(grade_cache.stats)
+        st.caption(f"Caché de calificación: {gc['entradas']} resultados guardados; en este proceso "
+                   f"{gc['hits']} aciertos y {gc['misses']} fallos.")
 else:
     st.info("Ingrese Admin key para ver el Dashboard.")
+
+perf.record("script.rerun", time.perf_counter() - _script_t0)
+perf.maybe_export()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# Auto-guardado de borradores (draft_answers) con seguimiento de cambios y debounce.
+# Cada sesión compara su buffer con lo último que envió (DraftTracker) y solo encola las
+# preguntas modificadas. Un hilo de fondo junta lo pendiente de todas las sesiones y lo
+# escribe con un único executemany cuando pasan DEBOUNCE_SEC sin cambios (o MAX_DELAY_SEC
+# desde el primer cambio sin guardar), así que escribir en un text_area no escribe en cada rerun.
+
+import atexit, threading, time
+
+import storage
+
+DEBOUNCE_SEC = 3.0
+MAX_DELAY_SEC = 15.0
+
+
+class DraftTracker:
+    """Vive en st.session_state: recuerda el último valor enviado por pregunta."""
+
+    def __init__(self, persisted: dict = None):
+        self.persisted = dict(persisted or {})
+
+    def changes(self, buffer: dict) -> dict:
+        return {q: v for q, v in buffer.items() if self.persisted.get(q, "") != v}
+
+    def mark_sent(self, changes: dict):
+        self.persisted.update(changes)
+
+
+class _Autosaver:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending = {}   # (db_file, user_id) -> {qid: respuesta}
+        self._first = {}     # (db_file, user_id) -> primer cambio sin guardar
+        self._last = {}      # (db_file, user_id) -> último cambio
+        self._thread = threading.Thread(target=self._run, name="draft-autosave", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, db_file: str, user_id: int, changes: dict):
+        if not changes:
+            return
+        key, now = (db_file, int(user_id)), time.monotonic()
+        with self._cond:
+            self._pending.setdefault(key, {}).update(changes)
+            self._first.setdefault(key, now)
+            self._last[key] = now
+            self._cond.notify()
+
+    def _take(self, keys) -> dict:
+        out = {}
+        for k in keys:
+            out[k] = self._pending.pop(k)
+            self._first.pop(k, None)
+            self._last.pop(k, None)
+        return out
+
+    def _write(self, batch: dict):
+        by_db = {}
+        for (db_file, user_id), answers in batch.items():
+            by_db.setdefault(db_file, []).extend((user_id, q, v) for q, v in answers.items())
+        for db_file, rows in by_db.items():
+            try:
+                with storage.connection(db_file) as con:
+                    storage.upsert_drafts(con, rows)
+            except Exception:
+                # No se pierde nada: se reencola y se reintenta en la siguiente vuelta
+                with self._cond:
+                    for user_id, q, v in rows:
+                        self._pending.setdefault((db_file, user_id), {}).setdefault(q, v)
+                        self._first.setdefault((db_file, user_id), time.monotonic())
+                        self._last.setdefault((db_file, user_id), time.monotonic())
+                raise
+
+    def _due(self, now: float) -> list:
+        return [k for k in self._pending
+                if now - self._last[k] >= DEBOUNCE_SEC or now - self._first[k] >= MAX_DELAY_SEC]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                due = self._due(time.monotonic())
+                if not due:
+                    self._cond.wait(timeout=DEBOUNCE_SEC / 3)
+                    continue
+                batch = self._take(due)
+            try:
+                self._write(batch)
+            except Exception:
+                time.sleep(DEBOUNCE_SEC)
+
+    def flush(self, db_file: str = None, user_id: int = None):
+        """Escribe ya lo pendiente (de un usuario, de una base o todo)."""
+        with self._cond:
+            keys = [k for k in self._pending
+                    if (db_file is None or k[0] == db_file) and (user_id is None or k[1] == int(user_id))]
+            batch = self._take(keys)
+        if batch:
+            self._write(batch)
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return sum(len(v) for v in self._pending.values())
+
+
+_saver = _Autosaver()
+atexit.register(_saver.flush)
+
+enqueue = _saver.enqueue
+flush = _saver.flush
+pending_count = _saver.pending_count
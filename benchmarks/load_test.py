@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+# Prueba de carga de app_prueba_tecnica.py con el harness AppTest de Streamlit.
+# Simula N candidatos recorriendo el flujo real (registro, MCQ, fórmulas, código, SQL,
+# "Guardar progreso" y "Enviar prueba") y una sesión de administrador que recarga el dashboard
+# mientras tanto. AppTest no es seguro entre hilos, así que la concurrencia se logra con procesos
+# que comparten el mismo quiz.db (igual que varias réplicas de la app).
+# Reporta percentiles de latencia por rerun y por envío, esperas por el lock de SQLite, memoria
+# por sesión y el tiempo hasta que termina la calificación en segundo plano.
+#
+# Uso:
+#   python benchmarks/load_test.py --candidates 20 --concurrency 4
+#   python benchmarks/load_test.py --save benchmarks/baselines/default.json
+#   python benchmarks/load_test.py --compare benchmarks/baselines/default.json   (exit 1 si hay regresión)
+
+import argparse, json, multiprocessing, os, platform, random, resource, shutil, sqlite3, sys, tempfile, time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = "app_prueba_tecnica.py"
+ADMIN_KEY = "bench-admin"
+DEFAULT_TOLERANCE = 1.3      # regresión si una métrica empeora más de 30 % frente a la línea base
+
+FORMULAS = ['SUMIFS(Ventas;Region;"Norte";Mes;"Enero")', "xlookup(a2, a:a, d:d)", "=SUMA(A1:A10)", ""]
+CODE = {
+    "code_301": "def fizzbuzz(n):\n    return 'FizzBuzz' if n%15==0 else 'Fizz' if n%3==0 else 'Buzz' if n%5==0 else str(n)\n",
+    "code_302": "def flatten_list(l):\n    return [y for x in l for y in (flatten_list(x) if isinstance(x, list) else [x])]\n",
+    "sql_501": "SELECT c.name AS customer, SUM(i.qty*i.price) total FROM customers c JOIN orders o ON o.customer_id=c.id "
+               "JOIN order_items i ON i.order_id=o.id GROUP BY c.name ORDER BY total DESC LIMIT 3",
+    "sql_502": "SELECT strftime('%Y-%m', order_date) mes, SUM(qty*price) total FROM orders o JOIN order_items i "
+               "ON i.order_id=o.id WHERE order_date LIKE '2024%' GROUP BY mes ORDER BY mes",
+}
+
+
+# ---------------- Entorno de trabajo ----------------
+def prepare_workdir() -> str:
+    """Copia la app, sus módulos y el banco a un directorio temporal con su propio quiz.db."""
+    workdir = tempfile.mkdtemp(prefix="quiz-bench-")
+    for f in os.listdir(ROOT):
+        if f.endswith((".py", ".xlsx")):
+            shutil.copy(os.path.join(ROOT, f), workdir)
+    os.makedirs(os.path.join(workdir, ".streamlit"))
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as f:
+        f.write(f'ADMIN_KEY = "{ADMIN_KEY}"\n')
+    return workdir
+
+
+def _enter(workdir: str):
+    os.chdir(workdir)
+    if workdir not in sys.path:
+        sys.path.insert(0, workdir)
+
+
+def _apptest(workdir: str):
+    from streamlit.testing.v1 import AppTest
+
+    return AppTest.from_file(os.path.join(workdir, APP), default_timeout=120)
+
+
+def _timed(at, out: list):
+    t0 = time.perf_counter()
+    at.run()
+    out.append(time.perf_counter() - t0)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+
+def _button(at, text: str):
+    return next(b for b in at.button if text in str(b.label))
+
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# ---------------- Sesiones simuladas ----------------
+def run_candidates(workdir: str, ids: list, seed: int) -> dict:
+    """Proceso de trabajo: recorre el flujo completo para cada candidato de `ids`, en serie."""
+    _enter(workdir)
+    import storage
+
+    rnd = random.Random(seed)
+    reruns, submits, errors, session_kb = [], [], [], []
+    for n, i in enumerate(ids):
+        rss0 = _rss_mb()
+        try:
+            at = _apptest(workdir)
+            _timed(at, reruns)
+            at.text_input(key="name").input(f"Candidato {i}")
+            at.text_input(key="email").input(f"c{i}@bench.local")
+            at.text_input(key="doc").input(str(100000 + i))
+            at.button[0].click()
+            _timed(at, reruns)
+            for radio in list(at.radio):
+                radio.set_value(rnd.choice(radio.options))
+                _timed(at, reruns)
+            for ti in list(at.text_input):
+                if str(ti.key).endswith("_formula"):
+                    ti.input(rnd.choice(FORMULAS))
+                    _timed(at, reruns)
+            for ta in list(at.text_area):
+                if ta.key in CODE:
+                    ta.input(CODE[ta.key] if rnd.random() < 0.8 else "")
+                    _timed(at, reruns)
+            _button(at, "Guardar").click()
+            _timed(at, reruns)
+            _button(at, "Enviar").click()
+            _timed(at, submits)
+        except Exception as e:
+            errors.append(f"candidato {i}: {e!r}")
+        # La primera sesión del proceso paga las importaciones; desde la segunda se mide el crecimiento
+        if n:
+            session_kb.append((_rss_mb() - rss0) * 1024)
+    return {"reruns": reruns, "submits": submits, "errors": errors,
+            "rss_mb": _rss_mb(), "session_kb": session_kb, "lock_waits": storage.lock_wait_stats()}
+
+
+def run_admin(workdir: str, stop) -> dict:
+    """Proceso de trabajo: sesión admin recargando el dashboard hasta que terminen los candidatos."""
+    _enter(workdir)
+    import storage
+
+    reruns, errors = [], []
+    try:
+        at = _apptest(workdir)
+        _timed(at, reruns)
+        at.text_input(key="adminkey2").input(ADMIN_KEY)
+        next(b for b in at.button if b.key == "admin_enter").click()
+        _timed(at, reruns)
+        while not stop.is_set():
+            _timed(at, reruns)
+            time.sleep(0.2)
+    except Exception as e:
+        errors.append(f"admin: {e!r}")
+    return {"reruns": reruns, "errors": errors, "lock_waits": storage.lock_wait_stats()}
+
+
+# ---------------- Métricas ----------------
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"n": 0}
+    v = sorted(values)
+
+    def q(p):
+        return round(v[min(len(v) - 1, int(round(p * (len(v) - 1))))] * 1000, 2)
+    return {"n": len(v), "p50_ms": q(0.50), "p95_ms": q(0.95), "p99_ms": q(0.99), "max_ms": round(v[-1] * 1000, 2)}
+
+
+def wait_for_grading(db_file: str, expected: int, timeout: float = 300.0) -> float:
+    t0 = time.perf_counter()
+    con = sqlite3.connect(db_file)
+    try:
+        while time.perf_counter() - t0 < timeout:
+            if con.execute("SELECT COUNT(*) FROM coding").fetchone()[0] >= expected:
+                break
+            time.sleep(0.1)
+    finally:
+        con.close()
+    return round(time.perf_counter() - t0, 2)
+
+
+def _worker(queue, name: str, target, *args):
+    try:
+        queue.put((name, target(*args)))
+    except Exception as e:
+        queue.put((name, {"errors": [f"{name}: {e!r}"]}))
+
+
+def run(candidates: int, concurrency: int, seed: int = 7) -> dict:
+    workdir = prepare_workdir()
+    # Procesos normales (no Pool): la app lanza sus propios procesos de sandbox
+    ctx = multiprocessing.get_context("spawn")
+    ids = list(range(candidates))
+    chunks = [ids[k::concurrency] for k in range(concurrency) if ids[k::concurrency]]
+    queue, stop = ctx.Queue(), ctx.Event()
+    procs = [ctx.Process(target=_worker, args=(queue, "admin", run_admin, workdir, stop))]
+    procs += [ctx.Process(target=_worker, args=(queue, f"c{k}", run_candidates, workdir, chunk, seed + k))
+              for k, chunk in enumerate(chunks)]
+    t0 = time.perf_counter()
+    for p in procs:
+        p.start()
+    results, admin_res = [], None
+    while len(results) < len(chunks):
+        name, res = queue.get()
+        if name == "admin":
+            admin_res = res
+        else:
+            results.append(res)
+    wall = time.perf_counter() - t0
+
+    # Cada entrega genera una fila en `coding` por práctica de código y de SQL
+    db_file = os.path.join(workdir, "quiz.db")
+    con = sqlite3.connect(db_file)
+    subs = con.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+    con.close()
+    grading_sec = wait_for_grading(db_file, subs * len(CODE))
+
+    stop.set()
+    if admin_res is None:
+        admin_res = queue.get()[1]
+    for p in procs:
+        p.join()
+    empty = {"reruns": [], "submits": [], "errors": [], "rss_mb": 0.0, "session_kb": [],
+             "lock_waits": {"n": 0, "total_sec": 0.0, "max_sec": 0.0}}
+    results = [{**empty, **r} for r in results]
+    admin_res = {**empty, **admin_res}
+
+    lock_n = sum(r["lock_waits"]["n"] for r in results) + admin_res["lock_waits"]["n"]
+    lock_total = sum(r["lock_waits"]["total_sec"] for r in results) + admin_res["lock_waits"]["total_sec"]
+    lock_max = max([r["lock_waits"]["max_sec"] for r in results] + [admin_res["lock_waits"]["max_sec"]])
+    session_kb = [x for r in results for x in r["session_kb"]]
+    shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "meta": {"candidates": candidates, "concurrency": len(chunks), "seed": seed,
+                 "python": platform.python_version(), "cpus": os.cpu_count(),
+                 "date": datetime.now().isoformat(timespec="seconds")},
+        "metrics": {
+            "rerun": percentiles([x for r in results for x in r["reruns"]]),
+            "submit": percentiles([x for r in results for x in r["submits"]]),
+            "admin_rerun": percentiles(admin_res["reruns"]),
+            "lock_wait": {"n": lock_n, "total_ms": round(lock_total * 1000, 2), "max_ms": round(lock_max * 1000, 2)},
+            "memory": {"rss_max_mb": round(max(r["rss_mb"] for r in results), 1),
+                       "per_session_kb": round(sum(session_kb) / len(session_kb), 1) if session_kb else None},
+            "submissions": subs,
+            "wall_sec": round(wall, 2),
+            "grading_drain_sec": grading_sec,
+        },
+        "errors": [e for r in results for e in r["errors"]] + admin_res["errors"],
+    }
+
+
+# ---------------- Líneas base ----------------
+# (métrica, campo) que se comparan contra la línea base: todas son "menor es mejor"
+COMPARED = [("rerun", "p50_ms"), ("rerun", "p95_ms"), ("submit", "p50_ms"), ("submit", "p95_ms"),
+            ("admin_rerun", "p50_ms"), ("admin_rerun", "p95_ms"), ("lock_wait", "max_ms"),
+            ("memory", "per_session_kb")]
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Lista de regresiones (métrica, base, actual, razón) por encima de `tolerance`."""
+    out = []
+    for metric, field in COMPARED:
+        base = baseline["metrics"].get(metric, {}).get(field)
+        cur = current["metrics"].get(metric, {}).get(field)
+        if not base or cur is None:
+            continue
+        ratio = cur / base
+        if ratio > tolerance:
+            out.append((f"{metric}.{field}", base, cur, round(ratio, 2)))
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Prueba de carga de la app con candidatos simulados (AppTest).")
+    ap.add_argument("--candidates", type=int, default=12)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--save", help="guardar el resultado como línea base (JSON)")
+    ap.add_argument("--compare", help="línea base (JSON) contra la cual comparar")
+    ap.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = ap.parse_args(argv)
+
+    res = run(args.candidates, args.concurrency, args.seed)
+    print(json.dumps(res, indent=2, ensure_ascii=False))
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+    if res["errors"]:
+        sys.exit(2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if any(baseline["meta"].get(k) != res["meta"][k] for k in ("candidates", "concurrency", "cpus")):
+            print("Aviso: la línea base se midió con otros parámetros o en otra máquina.")
+        regressions = compare(res, baseline, args.tolerance)
+        for name, base, cur, ratio in regressions:
+            print(f"REGRESIÓN {name}: {base} -> {cur} (x{ratio})")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+# Exportación de resultados bajo demanda (CSV / XLSX) con memoria acotada.
+# SQLite se lee por bloques (fetchmany) y cada bloque se escribe directo a un archivo temporal:
+# el CSV fila a fila y el XLSX con xlsxwriter en modo constant_memory (cada fila se vuelca a disco
+# al pasar a la siguiente). El pico de memoria no depende del tamaño del histórico.
+# La app pasa estas funciones como callable a st.download_button: solo corren al hacer clic.
+
+import csv, io, tempfile
+from datetime import date, timedelta
+
+import storage
+
+CHUNK_ROWS = 5000
+QUESTION_COLUMNS = ["enunciado", "categoria", "tipo", "respuesta_correcta", "puntos"]
+
+
+def parse_ids(text: str) -> list:
+    """'3, 7-9' -> [3, 7, 8, 9]. Vacío -> [] (sin filtro). ValueError si no se entiende."""
+    ids = []
+    for part in str(text or "").replace(";", ",").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            a, b = (int(x) for x in part.split("-", 1))
+            ids.extend(range(min(a, b), max(a, b) + 1))
+        else:
+            ids.append(int(part))
+    return sorted(set(ids))
+
+
+def _where(id_col: str, date_from: date = None, date_to: date = None, submission_ids: list = None):
+    """Filtro sobre la entrega (alias `s`): rango de fechas de envío (inclusivo) y/o ids."""
+    conds, params = [], []
+    if date_from:
+        conds.append("s.finished_at >= ?")
+        params.append(date_from.isoformat())
+    if date_to:
+        conds.append("s.finished_at < ?")
+        params.append((date_to + timedelta(days=1)).isoformat())
+    if submission_ids:
+        conds.append(f"{id_col} IN ({','.join('?' * len(submission_ids))})")
+        params.extend(int(i) for i in submission_ids)
+    return ("WHERE " + " AND ".join(conds) if conds else ""), params
+
+
+def _chunks(con, sql: str, params):
+    """(columnas, iterador de bloques de filas) sin materializar el resultado completo."""
+    cur = con.execute(sql, params)
+    cols = [d[0] for d in cur.description]
+
+    def gen():
+        while True:
+            rows = cur.fetchmany(CHUNK_ROWS)
+            if not rows:
+                return
+            yield rows
+    return cols, gen()
+
+
+def _summary_query(**filters):
+    where, params = _where("s.submission_id", **filters)
+    return f"{storage.SUMMARY_SELECT} {where} ORDER BY s.submission_id", params
+
+
+def _answers_query(**filters):
+    where, params = _where("s.id", **filters)
+    return f"""SELECT a.* FROM answers a JOIN submissions s ON s.id = a.submission_id
+               {where} ORDER BY a.submission_id, a.qid""", params
+
+
+def _coding_query(**filters):
+    where, params = _where("s.id", **filters)
+    return f"""SELECT c.* FROM coding c JOIN submissions s ON s.id = c.submission_id
+               {where} ORDER BY c.submission_id, c.task_type, c.task_id""", params
+
+
+def summary_csv(con, **filters) -> bytes:
+    with tempfile.TemporaryFile() as f:
+        text = io.TextIOWrapper(f, encoding="utf-8", newline="")
+        writer = csv.writer(text)
+        cols, chunks = _chunks(con, *_summary_query(**filters))
+        writer.writerow(cols)
+        for rows in chunks:
+            writer.writerows(rows)
+        text.flush()
+        f.seek(0)
+        data = f.read()
+        text.detach()
+    return data
+
+
+def _write_sheet(ws, cols, chunks):
+    ws.write_row(0, 0, cols)
+    n = 0
+    for rows in chunks:
+        for row in rows:
+            n += 1
+            ws.write_row(n, 0, row)
+
+
+def results_xlsx(con, preguntas, **filters) -> bytes:
+    """Hojas Submissions, Answers, Comparativo y Coding, fila a fila (constant_memory)."""
+    import xlsxwriter
+
+    questions = dict(zip(preguntas["id"].astype(int).tolist(), preguntas[QUESTION_COLUMNS].to_dict("split")["data"]))
+    blank = [None] * len(QUESTION_COLUMNS)
+    with tempfile.TemporaryDirectory() as tmp, tempfile.TemporaryFile() as f:
+        wb = xlsxwriter.Workbook(f, {"constant_memory": True, "tmpdir": tmp})
+        ws_sub, ws_ans = wb.add_worksheet("Submissions"), wb.add_worksheet("Answers")
+        ws_comp, ws_code = wb.add_worksheet("Comparativo"), wb.add_worksheet("Coding")
+
+        _write_sheet(ws_sub, *_chunks(con, *_summary_query(**filters)))
+
+        # Answers y Comparativo salen del mismo recorrido de `answers`
+        cols, chunks = _chunks(con, *_answers_query(**filters))
+        qid_pos = cols.index("qid")
+        ws_ans.write_row(0, 0, cols)
+        ws_comp.write_row(0, 0, cols + QUESTION_COLUMNS)
+        n = 0
+        for rows in chunks:
+            for row in rows:
+                n += 1
+                ws_ans.write_row(n, 0, row)
+                ws_comp.write_row(n, 0, list(row) + questions.get(row[qid_pos], blank))
+
+        _write_sheet(ws_code, *_chunks(con, *_coding_query(**filters)))
+
+        wb.close()
+        f.seek(0)
+        return f.read()
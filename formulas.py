@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+# Forma canónica de fórmulas de Excel para calificar FORMULA_EXCEL.
+# Tokeniza y arma un AST pequeño, de modo que escrituras equivalentes comparen igual:
+#   - nombres de función en español o inglés (SUMAR.SI.CONJUNTO == SUMIFS),
+#   - separador de argumentos `;` o `,` (y coma decimal en modo `;`, o si sin `;` no analiza),
+#   - anclas `$`, espacios, paréntesis redundantes, mayúsculas/acentos y comillas.
+# Si la entrada no se puede analizar se usa la comparación de texto normalizado de siempre.
+
+import unicodedata
+from functools import lru_cache
+
+CACHE_SIZE = 4096
+
+# Español -> inglés (claves sin acentos y en mayúsculas, como quedan tras norm_text)
+FUNCTIONS_ES_EN = {
+    "SUMA": "SUM", "SUMAR.SI": "SUMIF", "SUMAR.SI.CONJUNTO": "SUMIFS", "SUMAPRODUCTO": "SUMPRODUCT",
+    "CONTAR": "COUNT", "CONTARA": "COUNTA", "CONTAR.SI": "COUNTIF", "CONTAR.SI.CONJUNTO": "COUNTIFS",
+    "CONTAR.BLANCO": "COUNTBLANK", "PROMEDIO": "AVERAGE", "PROMEDIO.SI": "AVERAGEIF",
+    "PROMEDIO.SI.CONJUNTO": "AVERAGEIFS", "MAX.SI.CONJUNTO": "MAXIFS", "MIN.SI.CONJUNTO": "MINIFS",
+    "BUSCARV": "VLOOKUP", "BUSCARH": "HLOOKUP", "BUSCARX": "XLOOKUP", "BUSCAR": "LOOKUP",
+    "INDICE": "INDEX", "COINCIDIR": "MATCH", "COINCIDIRX": "XMATCH", "DESREF": "OFFSET",
+    "INDIRECTO": "INDIRECT", "ELEGIR": "CHOOSE", "FILA": "ROW", "COLUMNA": "COLUMN",
+    "FILAS": "ROWS", "COLUMNAS": "COLUMNS", "TRANSPONER": "TRANSPOSE",
+    "SI": "IF", "SI.ERROR": "IFERROR", "SI.ND": "IFNA", "SI.CONJUNTO": "IFS", "CAMBIAR": "SWITCH",
+    "Y": "AND", "O": "OR", "NO": "NOT", "XO": "XOR",
+    "FILTRAR": "FILTER", "FILTRO": "FILTER", "UNICOS": "UNIQUE", "ORDENAR": "SORT", "ORDENARPOR": "SORTBY",
+    "SECUENCIA": "SEQUENCE", "APILARV": "VSTACK", "APILARH": "HSTACK", "TOMAR": "TAKE", "EXCLUIR": "DROP",
+    "ELEGIRCOLS": "CHOOSECOLS", "ELEGIRFILAS": "CHOOSEROWS", "DIVIDIRTEXTO": "TEXTSPLIT",
+    "K.ESIMO.MENOR": "SMALL", "K.ESIMO.MAYOR": "LARGE", "JERARQUIA": "RANK", "JERARQUIA.EQV": "RANK.EQ",
+    "MEDIANA": "MEDIAN", "MODA": "MODE", "DESVEST": "STDEV", "DESVEST.M": "STDEV.S", "PERCENTIL": "PERCENTILE",
+    "SUBTOTALES": "SUBTOTAL", "AGREGAR": "AGGREGATE",
+    "REDONDEAR": "ROUND", "REDONDEAR.MAS": "ROUNDUP", "REDONDEAR.MENOS": "ROUNDDOWN", "ENTERO": "INT",
+    "RESIDUO": "MOD", "POTENCIA": "POWER", "RAIZ": "SQRT", "ALEATORIO": "RAND", "ALEATORIO.ENTRE": "RANDBETWEEN",
+    "CONCATENAR": "CONCATENATE", "UNIRCADENAS": "TEXTJOIN", "IZQUIERDA": "LEFT", "DERECHA": "RIGHT",
+    "EXTRAE": "MID", "LARGO": "LEN", "MAYUSC": "UPPER", "MINUSC": "LOWER", "NOMPROPIO": "PROPER",
+    "ESPACIOS": "TRIM", "SUSTITUIR": "SUBSTITUTE", "REEMPLAZAR": "REPLACE", "ENCONTRAR": "FIND",
+    "HALLAR": "SEARCH", "TEXTO": "TEXT", "VALOR": "VALUE",
+    "HOY": "TODAY", "AHORA": "NOW", "FECHA": "DATE", "ANO": "YEAR", "MES": "MONTH", "DIA": "DAY",
+    "DIASEM": "WEEKDAY", "FIN.MES": "EOMONTH", "FECHA.MES": "EDATE", "DIAS.LAB": "NETWORKDAYS",
+    "SIFECHA": "DATEDIF", "ESBLANCO": "ISBLANK", "ESERROR": "ISERROR", "ESNUMERO": "ISNUMBER",
+    "ESTEXTO": "ISTEXT", "VERDADERO": "TRUE", "FALSO": "FALSE",
+}
+BOOLEANS = {"TRUE": "TRUE", "FALSE": "FALSE", "VERDADERO": "TRUE", "FALSO": "FALSE"}
+
+# Precedencia de operadores binarios (de menor a mayor); ':' (rango) se trata en el primario
+BINARY_PRECEDENCE = {"=": 1, "<>": 1, "<": 1, ">": 1, "<=": 1, ">=": 1, "&": 2, "+": 3, "-": 3, "*": 4, "/": 4, "^": 5}
+_QUOTES = {'"': '"', "“": "”", "”": "”"}
+
+
+class FormulaError(ValueError):
+    pass
+
+
+def norm_text(s: str) -> str:
+    if not isinstance(s, str):
+        return ""
+    s = s.strip()
+    s = unicodedata.normalize("NFKD", s)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return s.upper()
+
+
+# ---------------- Tokenizador ----------------
+def _uses_semicolon(s: str) -> bool:
+    # Modo español: si hay `;` fuera de cadenas es el separador y la coma es decimal
+    in_str = None
+    for ch in s:
+        if in_str:
+            if ch == in_str:
+                in_str = None
+        elif ch in _QUOTES:
+            in_str = _QUOTES[ch]
+        elif ch == ";":
+            return True
+    return False
+
+
+def tokenize(s: str, semicolon: bool = None) -> list:
+    """Lista de (tipo, valor). Tipos: num, str, ident, op, sep, lpar, rpar, err."""
+    if semicolon is None:
+        semicolon = _uses_semicolon(s)
+    # En modo `;` la coma es decimal, pero `1.5` sigue siendo un número (fórmulas mezcladas)
+    decimals = ",." if semicolon else "."
+    toks, i, n = [], 0, len(s)
+    while i < n:
+        ch = s[i]
+        if ch.isspace():
+            i += 1
+        elif ch in _QUOTES:
+            close, j, buf = _QUOTES[ch], i + 1, []
+            while True:
+                if j >= n:
+                    raise FormulaError("Cadena sin cerrar")
+                if s[j] == close:
+                    if close == '"' and j + 1 < n and s[j + 1] == '"':
+                        buf.append('"')
+                        j += 2
+                        continue
+                    break
+                buf.append(s[j])
+                j += 1
+            toks.append(("str", "".join(buf)))
+            i = j + 1
+        elif ch == "'":
+            # Nombre de hoja entre comillas simples: 'Mi hoja'!A1
+            j = s.find("'", i + 1)
+            if j < 0 or j + 1 >= n or s[j + 1] != "!":
+                raise FormulaError("Comilla simple inválida")
+            k = j + 2
+            while k < n and (s[k].isalnum() or s[k] in "$_.:"):
+                k += 1
+            toks.append(("ident", s[i:k]))
+            i = k
+        elif ch.isdigit() or (ch in decimals and i + 1 < n and s[i + 1].isdigit()):
+            j = i
+            while j < n and s[j].isdigit():
+                j += 1
+            if j < n and s[j] in decimals and j + 1 < n and s[j + 1].isdigit():
+                j += 1
+                while j < n and s[j].isdigit():
+                    j += 1
+            if j < n and s[j] == "E" and j + 1 < n and (s[j + 1].isdigit() or s[j + 1] in "+-"):
+                j += 2
+                while j < n and s[j].isdigit():
+                    j += 1
+            toks.append(("num", s[i:j].replace(",", ".")))
+            i = j
+        elif ch.isalpha() or ch in "_$\\@":
+            j = i + 1
+            while j < n and (s[j].isalnum() or s[j] in "_.$!"):
+                j += 1
+            if j < n and s[j] == "[":
+                depth = 0
+                while j < n:
+                    depth += (s[j] == "[") - (s[j] == "]")
+                    j += 1
+                    if depth == 0:
+                        break
+                if depth:
+                    raise FormulaError("Corchete sin cerrar")
+            toks.append(("ident", s[i:j]))
+            i = j
+        elif ch == "#":
+            j = i + 1
+            while j < n and (s[j].isalnum() or s[j] in "/!?"):
+                j += 1
+            toks.append(("err", s[i:j]))
+            i = j
+        elif s.startswith(("<=", ">=", "<>"), i):
+            toks.append(("op", s[i:i + 2]))
+            i += 2
+        elif ch in "+-*/^&=<>%:":
+            toks.append(("op", ch))
+            i += 1
+        elif ch in ";,":
+            # En modo `;` las comas que no fueron decimales también separan argumentos
+            toks.append(("sep", ","))
+            i += 1
+        elif ch == "(":
+            toks.append(("lpar", ch))
+            i += 1
+        elif ch == ")":
+            toks.append(("rpar", ch))
+            i += 1
+        else:
+            raise FormulaError(f"Carácter inesperado: {ch!r}")
+    return toks
+
+
+# ---------------- Parser (AST de tuplas) ----------------
+class _Parser:
+    def __init__(self, toks: list):
+        self.toks, self.pos = toks, 0
+
+    def peek(self):
+        return self.toks[self.pos] if self.pos < len(self.toks) else (None, None)
+
+    def take(self, kind=None, value=None):
+        tok = self.peek()
+        if tok[0] is None or (kind and tok[0] != kind) or (value and tok[1] != value):
+            raise FormulaError(f"Se esperaba {value or kind}")
+        self.pos += 1
+        return tok
+
+    def parse(self):
+        if self.peek() == ("op", "="):
+            self.pos += 1
+        node = self.expr(0)
+        if self.pos != len(self.toks):
+            raise FormulaError("Sobran tokens")
+        return node
+
+    def expr(self, min_prec: int):
+        left = self.unary()
+        while True:
+            kind, op = self.peek()
+            prec = BINARY_PRECEDENCE.get(op) if kind == "op" else None
+            if prec is None or prec < min_prec:
+                return left
+            self.pos += 1
+            # ^ es asociativo a la izquierda en Excel, igual que el resto
+            right = self.expr(prec + 1)
+            left = ("bin", op, left, right)
+
+    def unary(self):
+        kind, op = self.peek()
+        if kind == "op" and op in "+-":
+            self.pos += 1
+            operand = self.unary()
+            return operand if op == "+" else ("neg", operand)
+        return self.postfix()
+
+    def postfix(self):
+        node = self.range_()
+        while self.peek() == ("op", "%"):
+            self.pos += 1
+            node = ("pct", node)
+        return node
+
+    def range_(self):
+        node = self.primary()
+        while self.peek() == ("op", ":"):
+            self.pos += 1
+            node = ("range", node, self.primary())
+        return node
+
+    def primary(self):
+        kind, val = self.peek()
+        if kind == "num":
+            self.pos += 1
+            return ("num", _canon_number(val))
+        if kind == "str":
+            self.pos += 1
+            return ("str", val)
+        if kind == "err":
+            self.pos += 1
+            return ("err", val)
+        if kind == "lpar":
+            self.pos += 1
+            node = self.expr(0)
+            self.take("rpar")
+            return node
+        if kind == "ident":
+            self.pos += 1
+            if self.peek()[0] == "lpar":
+                self.pos += 1
+                return ("func", _canon_function(val), self.args())
+            name = val.replace("$", "").lstrip("@")
+            return ("bool", BOOLEANS[name]) if name in BOOLEANS else ("ref", name)
+        raise FormulaError("Expresión incompleta")
+
+    def args(self):
+        args = []
+        if self.peek()[0] == "rpar":
+            self.pos += 1
+            return args
+        while True:
+            if self.peek()[0] in ("sep", "rpar"):
+                args.append(("empty",))
+            else:
+                args.append(self.expr(0))
+            kind, _ = self.take()
+            if kind == "rpar":
+                return args
+            if kind != "sep":
+                raise FormulaError("Se esperaba separador")
+
+
+def _canon_number(txt: str) -> str:
+    v = float(txt)
+    return str(int(v)) if v.is_integer() and abs(v) < 1e15 else repr(v)
+
+
+def _canon_function(name: str) -> str:
+    name = name.replace("$", "").lstrip("@")
+    if name.startswith("_XLFN."):
+        name = name[len("_XLFN."):]
+    return FUNCTIONS_ES_EN.get(name, name)
+
+
+def parse(formula: str):
+    s = norm_text(formula)
+    try:
+        return _Parser(tokenize(s)).parse()
+    except FormulaError:
+        if _uses_semicolon(s):
+            raise
+        # Sin `;` una coma que no encaja como separador es decimal (=A1*1,5): modo español
+        return _Parser(tokenize(s, semicolon=True)).parse()
+
+
+def render(node) -> str:
+    kind = node[0]
+    if kind in ("num", "ref", "bool", "err"):
+        return node[1]
+    if kind == "str":
+        return '"' + node[1].replace('"', '""') + '"'
+    if kind == "empty":
+        return ""
+    if kind == "func":
+        return f"{node[1]}({','.join(render(a) for a in node[2])})"
+    if kind == "bin":
+        return f"({render(node[2])}{node[1]}{render(node[3])})"
+    if kind == "neg":
+        return f"-{render(node[1])}"
+    if kind == "pct":
+        return f"{render(node[1])}%"
+    if kind == "range":
+        return f"{render(node[1])}:{render(node[2])}"
+    raise FormulaError(f"Nodo desconocido: {kind}")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def canonical(formula: str) -> str:
+    """Forma canónica (memoizada) de una fórmula; cadena vacía si no hay fórmula."""
+    if not isinstance(formula, str) or not formula.strip():
+        return ""
+    try:
+        return render(parse(formula))
+    except (FormulaError, ValueError, RecursionError):
+        return "~" + norm_text(formula).replace(" ", "")
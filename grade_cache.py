@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# Caché persistente de resultados de calificación (CODIGO_PY y SQL_QUERY), direccionada por contenido.
+# La clave es un hash de (tipo, pregunta, huella de la especificación, respuesta normalizada):
+# - Python: tokens significativos (sin comentarios, líneas en blanco ni espacios entre tokens).
+# - SQL: sin comentarios, espacios colapsados y palabras fuera de literales en mayúsculas
+#   (SQLite no distingue mayúsculas en palabras clave ni en identificadores).
+# La huella es el hash de los tests (PY) o de los resultados esperados (SQL) de esa pregunta: si
+# cambian, la clave cambia y lo anterior deja de usarse; si cambia otra pregunta del banco, lo de
+# esta sigue sirviendo. Las filas viejas salen por LRU (last_used) al superar MAX_ENTRIES.
+
+import ast, hashlib, io, json, re, threading, time, tokenize
+
+import question_bank, sql_grader, storage
+
+KEY_FORMAT = 2           # subir si cambia la normalización o lo que devuelven los calificadores
+MAX_ENTRIES = 20_000
+PRUNE_EVERY = 200        # inserciones (por proceso) entre podas
+TOUCH_SEC = 60.0         # last_used se reescribe como mucho una vez por minuto por entrada
+# Resultados que dependen de la carga del momento (tiempo, memoria, worker caído) no se guardan
+_TRANSIENT = ("excedid", "excedió", "abruptamente", "Error interno")
+
+_SQL_TOKEN = re.compile(r"""
+    (?P<comment>--[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<space>\s+)
+  | (?P<literal>'(?:[^']|'')*(?:'|\Z)|"(?:[^"]|"")*(?:"|\Z)|`[^`]*(?:`|\Z)|\[[^\]]*(?:\]|\Z))
+  | (?P<word>\w+)
+  | (?P<op>.)
+""", re.S | re.X)
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "inserts": 0}
+
+
+# ---------------- Normalización ----------------
+_FSTRING_START = getattr(tokenize, "FSTRING_START", None)
+_FSTRING_END = getattr(tokenize, "FSTRING_END", None)
+
+
+def _source_slice(lines, start, end) -> str:
+    (r0, c0), (r1, c1) = start, end
+    if r0 == r1:
+        return lines[r0 - 1][c0:c1]
+    return lines[r0 - 1][c0:] + "".join(lines[r0:r1 - 1]) + lines[r1 - 1][:c1]
+
+
+def normalize_python(code: str) -> str:
+    # Si no compila se usa el texto tal cual: el mensaje de error cita números de línea
+    code = code or ""
+    try:
+        ast.parse(code)
+        lines, out, fstart, depth = code.splitlines(True), [], None, 0
+        for t in tokenize.generate_tokens(io.StringIO(code).readline):
+            # Desde 3.12 los f-strings llegan en trozos ("{{" como "{"): se copian literales, como en 3.11
+            if t.type == _FSTRING_START:
+                depth += 1
+                fstart = fstart or t.start
+                continue
+            if depth:
+                if t.type == _FSTRING_END:
+                    depth -= 1
+                    if not depth:
+                        out.append(_source_slice(lines, fstart, t.end))
+                        fstart = None
+                continue
+            if t.type in (tokenize.COMMENT, tokenize.NL, tokenize.ENDMARKER):
+                continue
+            if t.type == tokenize.INDENT:
+                out.append("<indent>")
+            elif t.type == tokenize.DEDENT:
+                out.append("<dedent>")
+            elif t.type == tokenize.NEWLINE:
+                out.append("<nl>")
+            else:
+                out.append(t.string)
+        return " ".join(out)
+    except (SyntaxError, ValueError, tokenize.TokenError):
+        return code
+
+
+def normalize_sql(sql: str) -> str:
+    # Un espacio donde había espacios o comentarios, nada donde no había (1.5 != 1 . 5)
+    out, gap = [], False
+    for m in _SQL_TOKEN.finditer(sql or ""):
+        kind, tok = m.lastgroup, m.group()
+        if kind in ("comment", "space"):
+            gap = True
+            continue
+        if gap and out:
+            out.append(" ")
+        gap = False
+        out.append(tok.upper() if kind == "word" else tok)
+    # Igual que sql_grader._single_statement
+    return "".join(out).strip().rstrip(";").strip()
+
+
+# ---------------- Clave ----------------
+def _spec_digest(task: dict) -> str:
+    if task["task_type"] == "SQL":
+        bank = question_bank.get_bank(task["bank_version"])
+        return sql_grader.get_template(bank).expected_digest.get(task["qid"], "")
+    spec = json.dumps([task.get("funcion"), task.get("tests")], ensure_ascii=False, default=str)
+    return hashlib.blake2b(spec.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def task_key(task: dict) -> str:
+    text = task.get("text") or ""
+    norm = normalize_sql(text) if task["task_type"] == "SQL" else normalize_python(text)
+    raw = json.dumps([KEY_FORMAT, task["task_type"], int(task["qid"]), _spec_digest(task), norm],
+                     ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ---------------- Lectura / escritura ----------------
+def cacheable(res: dict) -> bool:
+    return not any(any(m in str(d.get("error", "")) for m in _TRANSIENT) for d in res.get("details", ()))
+
+
+def get(con, key: str):
+    """{"passed", "total", "details"} guardado para `key`, o None."""
+    row = con.execute("SELECT passed, total, details, last_used FROM grade_cache WHERE key=?", (key,)).fetchone()
+    with _lock:
+        _stats["hits" if row else "misses"] += 1
+    if row is None:
+        return None
+    now = time.time()
+    if now - (row[3] or 0) >= TOUCH_SEC:
+        with storage.transaction(con):
+            con.execute("UPDATE grade_cache SET last_used=? WHERE key=?", (now, key))
+    return {"passed": row[0], "total": row[1], "details": json.loads(row[2])}
+
+
+def put(con, key: str, task: dict, res: dict):
+    """Guarda el resultado (si no es transitorio); dentro de una transacción abierta se suma a ella."""
+    if not cacheable(res):
+        return
+    with _lock:
+        _stats["inserts"] += 1
+        due = _stats["inserts"] % PRUNE_EVERY == 0
+    with storage.transaction(con):
+        con.execute("""INSERT OR REPLACE INTO grade_cache(key, task_type, task_id, passed, total, details, last_used)
+                       VALUES (?,?,?,?,?,?,?)""",
+                    (key, task["task_type"], int(task["qid"]), int(res["passed"]), int(res["total"]),
+                     json.dumps(res["details"], ensure_ascii=False), time.time()))
+        if due:
+            prune(con)
+
+
+def prune(con, max_entries: int = MAX_ENTRIES) -> int:
+    """Borra las entradas menos usadas por encima de `max_entries`; retorna cuántas."""
+    extra = con.execute("SELECT COUNT(*) FROM grade_cache").fetchone()[0] - max_entries
+    if extra <= 0:
+        return 0
+    con.execute("DELETE FROM grade_cache WHERE key IN (SELECT key FROM grade_cache ORDER BY last_used LIMIT ?)",
+                (extra,))
+    return extra
+
+
+def stats(con=None) -> dict:
+    """Aciertos/fallos del proceso y, con `con`, entradas guardadas."""
+    with _lock:
+        out = dict(_stats)
+    if con is not None:
+        out["entradas"] = con.execute("SELECT COUNT(*) FROM grade_cache").fetchone()[0]
+    return out
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# Calificación de prácticas (CODIGO_PY y SQL_QUERY) fuera del hilo del script de Streamlit.
+# El código Python corre en el pool de `sandbox`, el SQL en una copia de la plantilla de
+# `sql_grader`; el resultado de cada tarea se escribe en `coding`. Una respuesta equivalente a
+# otra ya calificada para la misma pregunta (ver grade_cache) reutiliza ese resultado.
+
+import json, threading
+from concurrent.futures import ThreadPoolExecutor
+
+import grade_cache, perf, question_bank, sandbox, sql_grader, storage
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # Un hilo por worker: cada hilo "alquila" un proceso del pool mientras califica
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=sandbox.get_pool().size,
+                                           thread_name_prefix="grading")
+        return _executor
+
+
+def build_code_tasks(bank, answers: dict) -> list:
+    tasks = []
+    preguntas = bank.preguntas
+    for row in preguntas[preguntas["tipo"] == "CODIGO_PY"].itertuples(index=False):
+        spec = bank.code_tests.get(int(row.id), {"funcion": "", "tests": []})
+        tasks.append({
+            "task_type": "PY",
+            "qid": int(row.id),
+            "text": str(answers.get(row.id, "") or ""),
+            "puntos": float(row.puntos),
+            "funcion": spec["funcion"],
+            "tests": spec["tests"],
+        })
+    return tasks
+
+
+def build_sql_tasks(bank, answers: dict) -> list:
+    preguntas = bank.preguntas
+    return [{
+        "task_type": "SQL",
+        "qid": int(row.id),
+        "text": str(answers.get(row.id, "") or ""),
+        "puntos": float(row.puntos),
+        "bank_version": bank.version,
+    } for row in preguntas[preguntas["tipo"] == "SQL_QUERY"].itertuples(index=False)]
+
+
+def grade_task(task: dict) -> dict:
+    if task["task_type"] == "SQL":
+        bank = question_bank.get_bank(task["bank_version"])
+        res = sql_grader.get_template(bank).grade(task["qid"], task["text"])
+    else:
+        res = sandbox.get_pool().run(task["text"], task["funcion"], task["tests"])
+    return {**res, "score": _score(task, res)}
+
+
+def _score(task: dict, res: dict) -> float:
+    total = res["total"]
+    return round(task["puntos"] * res["passed"] / total, 2) if total else 0.0
+
+
+def _store(con, submission_id: int, task: dict, res: dict):
+    storage.insert_coding(con, submission_id, task["task_type"], task["qid"],
+                          res["passed"], res["total"], json.dumps(res["details"], ensure_ascii=False), res["score"])
+
+
+def _grade_and_store(db_file: str, submission_id: int, task: dict) -> dict:
+    # Respuestas equivalentes a una ya calificada (misma clave en grade_cache) no pasan por el sandbox.
+    # La conexión se pide dos veces: no queda tomada mientras corre el sandbox.
+    key, cached = None, None
+    try:
+        with perf.timer("grading.cache"):
+            key = grade_cache.task_key(task)
+            with storage.connection(db_file) as con:
+                cached = grade_cache.get(con, key)
+        if cached is not None:
+            res = {**cached, "score": _score(task, cached)}
+        else:
+            with perf.timer(f"grading.{task['task_type']}"):
+                res = grade_task(task)
+    except Exception as e:
+        key = None
+        res = {"passed": 0, "total": len(task.get("tests", ())) or 1, "score": 0.0,
+               "details": [{"ok": False, "error": f"Error interno: {e}"}]}
+    with perf.timer("grading.store"), storage.connection(db_file) as con:
+        with storage.transaction(con):
+            _store(con, submission_id, task, res)
+            if key and cached is None:
+                grade_cache.put(con, key, task, res)
+    return res
+
+
+def submit_grading(db_file: str, submission_id: int, tasks: list) -> list:
+    """Encola la calificación de las tareas de una entrega y retorna sus futures.
+    No bloquea: los resultados se guardan en `coding` a medida que terminan."""
+    ex = _get_executor()
+    return [ex.submit(_grade_and_store, db_file, submission_id, t) for t in tasks]
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Análisis de ítems del banco (MCQ / FORMULA_EXCEL) a partir de las sumas corridas de `item_stats`
+# e `item_options`, que storage.insert_submission actualiza con cada entrega. Aquí solo se
+# combinan esas sumas con NumPy: el costo depende del número de preguntas, no de respuestas.
+# - p: proporción de aciertos (dificultad; alto = fácil).
+# - r_pb: point-biserial corregido entre acierto y puntaje del resto de la prueba (discriminación).
+# - r_tiempo: correlación entre acierto y duración de la entrega.
+
+import numpy as np
+import pandas as pd
+
+MIN_RESPONSES = 5      # por debajo de esto las correlaciones no se muestran
+QUESTION_COLUMNS = ["id", "categoria", "tipo", "enunciado", "respuesta_correcta"]
+
+
+def _corr(n, sx, sy, sy2, sxy):
+    """Pearson entre x binaria (sx = aciertos, x² = x) e y continua, desde sumas."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = n * sxy - sx * sy
+        var = (n * sx - sx ** 2) * (n * sy2 - sy ** 2)
+        r = cov / np.sqrt(var)
+    return np.where((var > 0) & (n >= MIN_RESPONSES), r, np.nan)
+
+
+def item_stats(con, preguntas: pd.DataFrame) -> pd.DataFrame:
+    df = pd.read_sql_query("SELECT * FROM item_stats", con)
+    df = preguntas[QUESTION_COLUMNS].rename(columns={"id": "qid"}).merge(df, on="qid", how="inner")
+    n = df["n"].to_numpy(float)
+    k = df["n_correct"].to_numpy(float)
+    out = df[["qid", "categoria", "tipo", "enunciado"]].copy()
+    out["respuestas"] = df["n"].astype(int)
+    out["p"] = np.round(np.where(n > 0, k / np.maximum(n, 1), np.nan), 3)
+    out["r_pb"] = np.round(_corr(n, k, df["sum_rest"].to_numpy(float), df["sum_rest_sq"].to_numpy(float),
+                                 df["sum_rest_correct"].to_numpy(float)), 3)
+    out["r_tiempo"] = np.round(_corr(n, k, df["sum_dur"].to_numpy(float), df["sum_dur_sq"].to_numpy(float),
+                                     df["sum_dur_correct"].to_numpy(float)), 3)
+    return out.sort_values("qid").reset_index(drop=True)
+
+
+def distractors(con, preguntas: pd.DataFrame) -> pd.DataFrame:
+    """Frecuencia de cada opción elegida en las MCQ ('' = sin responder)."""
+    mcq = preguntas.loc[preguntas["tipo"] == "MCQ", ["id", "respuesta_correcta"]].rename(columns={"id": "qid"})
+    df = pd.read_sql_query("SELECT qid, opcion, n FROM item_options", con).merge(mcq, on="qid", how="inner")
+    df["pct"] = (df["n"] / df.groupby("qid")["n"].transform("sum")).round(3)
+    df["correcta"] = df["opcion"] == df["respuesta_correcta"].astype(str).str.strip().str.upper().str[:1]
+    return df.drop(columns="respuesta_correcta").sort_values(["qid", "opcion"]).reset_index(drop=True)
+
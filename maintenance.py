@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# Mantenimiento en línea de quiz.db: retención, archivo y compactación.
+# Cada tarea trabaja por lotes chicos (BATCH_ROWS filas por transacción y una pausa entre lotes),
+# así la cola de envíos y el auto-guardado siguen escribiendo mientras corre.
+# - borradores: borra los de candidatos que ya entregaron.
+# - admins: deja una fila por administrador (mismo nombre, email y documento).
+# - archivo: mueve las entregas con más de ARCHIVE_AFTER_DAYS días a <db>_archive.db (adjunta como
+#   `archive`); el dashboard las consulta bajo demanda. KPIs y análisis de ítems quedan sobre lo vigente.
+# - compactación: PRAGMA incremental_vacuum por tramos y ANALYZE acotado (analysis_limit).
+# Uso: python maintenance.py --db quiz.db [--archive-days 180] [--vacuum-full]
+
+import argparse, os, threading, time
+from datetime import datetime, timedelta
+
+import perf, storage
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get("QUIZ_ARCHIVE_DAYS", "180"))
+BATCH_ROWS = 500
+VACUUM_PAGES = 256
+PAUSE_SEC = 0.05
+ANALYSIS_LIMIT = 1000
+
+
+# ---------------- Tareas ----------------
+def purge_drafts(con) -> int:
+    n = 0
+    while True:
+        with storage.transaction(con):
+            cur = con.execute("""DELETE FROM draft_answers WHERE rowid IN (
+                SELECT d.rowid FROM draft_answers d
+                WHERE EXISTS (SELECT 1 FROM submission_summary s WHERE s.user_id = d.user_id) LIMIT ?)""",
+                              (BATCH_ROWS,))
+        n += cur.rowcount
+        if cur.rowcount < BATCH_ROWS:
+            return n
+        time.sleep(PAUSE_SEC)
+
+
+def dedupe_admins(con) -> int:
+    # Las filas de administrador no se referencian desde otras tablas
+    with storage.transaction(con):
+        cur = con.execute("""DELETE FROM users WHERE role = 'administrador' AND id NOT IN (
+            SELECT MIN(id) FROM users WHERE role = 'administrador' GROUP BY name, email, doc)""")
+    return cur.rowcount
+
+
+def archive_old(con, days: int = ARCHIVE_AFTER_DAYS) -> int:
+    """Mueve al archivo las entregas terminadas hace más de `days` días; retorna cuántas."""
+    cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat()
+    storage.attach_archive(con)
+    moved = 0
+    while True:
+        ids = [r[0] for r in con.execute("SELECT id FROM main.submissions WHERE finished_at < ? ORDER BY id LIMIT ?",
+                                         (cutoff, BATCH_ROWS))]
+        if not ids:
+            break
+        marks = ",".join("?" * len(ids))
+        # Con WAL una transacción sobre dos bases no es atómica entre ellas: primero se copia
+        # (idempotente) y en otra transacción se borra de la principal solo lo que ya está archivado.
+        with storage.transaction(con):
+            for table in storage.ARCHIVE_TABLES:
+                key, cols = storage.archive_key(table), storage.table_columns(con, table)
+                con.execute(f"DELETE FROM archive.{table} WHERE {key} IN ({marks})", ids)
+                con.execute(f"INSERT INTO archive.{table}({cols}) SELECT {cols} FROM main.{table} WHERE {key} IN ({marks})",
+                            ids)
+        with storage.transaction(con):
+            done = [r[0] for r in con.execute(f"SELECT id FROM archive.submissions WHERE id IN ({marks})", ids)]
+            done_marks = ",".join("?" * len(done))
+            for table in storage.ARCHIVE_TABLES:
+                con.execute(f"DELETE FROM main.{table} WHERE {storage.archive_key(table)} IN ({done_marks})", done)
+        moved += len(done)
+        time.sleep(PAUSE_SEC)
+    if moved:
+        storage.refresh_rollups(con)
+    return moved
+
+
+def compact(con, full: bool = False) -> dict:
+    """Libera páginas vacías por tramos y actualiza estadísticas del planificador.
+    Una base creada antes de auto_vacuum=INCREMENTAL necesita un VACUUM completo una vez (`full`,
+    bloquea la base mientras dura: usar en una ventana sin candidatos)."""
+    if con.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        if not full:
+            return {"paginas_liberadas": 0, "vacuum": "requiere --vacuum-full"}
+        con.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        con.execute("VACUUM main")
+    freed = 0
+    free = con.execute("PRAGMA freelist_count").fetchone()[0]
+    while free:
+        # executescript: el pragma libera una página por paso y así corre hasta el final
+        con.executescript(f"BEGIN IMMEDIATE; PRAGMA incremental_vacuum({VACUUM_PAGES}); COMMIT;")
+        left = con.execute("PRAGMA freelist_count").fetchone()[0]
+        if left >= free:
+            break
+        freed, free = freed + free - left, left
+        time.sleep(PAUSE_SEC)
+    con.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+    con.execute("ANALYZE main")
+    con.execute("PRAGMA wal_checkpoint(PASSIVE)")
+    return {"paginas_liberadas": freed, "vacuum": "incremental"}
+
+
+def run(db_file: str, archive_days: int = ARCHIVE_AFTER_DAYS, vacuum_full: bool = False) -> dict:
+    t0 = time.perf_counter()
+    with perf.timer("maintenance"), storage.connection(db_file) as con:
+        report = {"borradores": purge_drafts(con), "admins": dedupe_admins(con),
+                  "archivadas": archive_old(con, archive_days)}
+        report.update(compact(con, vacuum_full))
+    report["seg"] = round(time.perf_counter() - t0, 2)
+    return report
+
+
+# ---------------- En segundo plano (dashboard) ----------------
+class _Maintenance:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last = None      # (fin, reporte o error)
+
+    def start(self, db_file: str, archive_days: int = ARCHIVE_AFTER_DAYS) -> bool:
+        """Lanza una corrida si no hay otra en curso; False si ya estaba corriendo."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._thread = threading.Thread(target=self._run, args=(db_file, archive_days),
+                                            name="maintenance", daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self, db_file: str, archive_days: int):
+        try:
+            result = run(db_file, archive_days)
+        except Exception as e:
+            result = {"error": f"{type(e).__name__}: {e}"}
+        self._last = (storage.now_iso(), result)
+
+    def status(self) -> dict:
+        with self._lock:
+            running = self._thread is not None and self._thread.is_alive()
+        return {"corriendo": running, "ultima": self._last}
+
+
+_maintenance = _Maintenance()
+
+start = _maintenance.start
+status = _maintenance.status
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Mantenimiento de la base: borradores, admins, archivo y compactación.")
+    ap.add_argument("--db", default="quiz.db")
+    ap.add_argument("--archive-days", type=int, default=ARCHIVE_AFTER_DAYS,
+                    help="archivar entregas terminadas hace más de N días")
+    ap.add_argument("--vacuum-full", action="store_true",
+                    help="convertir a auto_vacuum=INCREMENTAL con un VACUUM completo (bloquea la base)")
+    args = ap.parse_args(argv)
+    res = run(args.db, args.archive_days, args.vacuum_full)
+    print(" | ".join(f"{k}: {v}" for k, v in res.items()))
+
+
+if __name__ == "__main__":
+    main()
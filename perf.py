@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# Instrumentación liviana de las fases calientes de la app (carga del banco, render de pestañas,
+# auto-guardado, envío, calificación, dashboard y exportación).
+# Cada medición va a un ring buffer en memoria por proceso (deque acotado): registrar cuesta un
+# perf_counter y un append, sin E/S. El dashboard muestra p50/p95 por fase y, si se define
+# QUIZ_PERF_PROM_FILE, se escribe periódicamente un archivo en formato texto de Prometheus
+# (para el textfile collector de node_exporter).
+
+import os, tempfile, threading, time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+RING_SIZE = 20_000
+PROM_FILE = os.environ.get("QUIZ_PERF_PROM_FILE", "")
+PROM_INTERVAL_SEC = 15.0
+QUANTILES = (0.5, 0.95, 0.99)
+
+_events = deque(maxlen=RING_SIZE)    # (fase, segundos, epoch)
+_lock = threading.Lock()
+_last_export = 0.0
+
+
+def record(phase: str, seconds: float):
+    with _lock:
+        _events.append((phase, seconds, time.time()))
+
+
+@contextmanager
+def timer(phase: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - t0)
+
+
+def timed(phase: str):
+    """Decorador: mide cada llamada a la función como `phase`."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(phase):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def events() -> "pd.DataFrame":
+    import pandas as pd   # solo el panel de rendimiento: registrar no debe cargar pandas
+    with _lock:
+        rows = list(_events)
+    return pd.DataFrame(rows, columns=["fase", "seg", "ts"])
+
+
+def summary() -> "pd.DataFrame":
+    """Por fase: n, p50/p95/p99 y máximo en milisegundos (sobre lo que queda en el buffer)."""
+    import numpy as np
+    import pandas as pd
+    df = events()
+    if df.empty:
+        return pd.DataFrame(columns=["fase", "n", "p50_ms", "p95_ms", "p99_ms", "max_ms", "total_s"])
+    out = []
+    for phase, g in df.groupby("fase", sort=True):
+        v = g["seg"].to_numpy()
+        p50, p95, p99 = np.quantile(v, QUANTILES) * 1000
+        out.append((phase, len(v), round(p50, 2), round(p95, 2), round(p99, 2), round(v.max() * 1000, 2), round(v.sum(), 3)))
+    return pd.DataFrame(out, columns=["fase", "n", "p50_ms", "p95_ms", "p99_ms", "max_ms", "total_s"])
+
+
+def prometheus_text() -> str:
+    import numpy as np
+    lines = ["# HELP quiz_phase_seconds Duración de las fases de la app (ventana del ring buffer).",
+             "# TYPE quiz_phase_seconds summary"]
+    df = events()
+    for phase, g in df.groupby("fase", sort=True):
+        v = g["seg"].to_numpy()
+        label = phase.replace("\\", "\\\\").replace('"', '\\"')
+        for q, val in zip(QUANTILES, np.quantile(v, QUANTILES)):
+            lines.append(f'quiz_phase_seconds{{phase="{label}",quantile="{q}"}} {val:.6f}')
+        lines.append(f'quiz_phase_seconds_sum{{phase="{label}"}} {v.sum():.6f}')
+        lines.append(f'quiz_phase_seconds_count{{phase="{label}"}} {len(v)}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str):
+    """Escritura atómica (el collector nunca ve un archivo a medias)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".prom.tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+
+
+def maybe_export():
+    """Exporta a QUIZ_PERF_PROM_FILE como mucho cada PROM_INTERVAL_SEC (no-op si no está definido)."""
+    global _last_export
+    if not PROM_FILE:
+        return
+    now = time.monotonic()
+    with _lock:
+        if now - _last_export < PROM_INTERVAL_SEC:
+            return
+        _last_export = now
+    try:
+        write_prometheus(PROM_FILE)
+    except OSError:
+        pass
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+# Banco de preguntas compilado (Cuestionario_Prueba_Tecnica.xlsx) sin dependencias de Streamlit.
+# El Excel se parsea una sola vez por contenido: el resultado (preguntas, opciones ya separadas,
+# variantes de fórmulas canonicalizadas, tests y tablas SQL) se guarda como snapshot pickle
+# identificado por el hash SHA-256 del archivo. Si el archivo cambia, cambia el hash y se recompila.
+# Cada versión se archiva además en banks/<hash>.xlsx, así conviven varias pruebas y una entrega
+# vieja siempre puede recalificarse con su clave original. En memoria se guarda un LRU acotado.
+
+import hashlib, json, os, pickle, shutil, tempfile, threading
+from collections import OrderedDict, namedtuple
+
+import pandas as pd
+
+import scoring
+
+BANK_CACHE_DIR = ".bank_cache"
+BANKS_DIR = "banks"
+BANK_MEMORY_SIZE = 8  # bancos compilados en memoria (LRU)
+SNAPSHOT_FORMAT = 3   # subir si cambia CompiledBank o la canonicalización de fórmulas
+SQL_SHEET_PREFIX = "Datos_SQL_"
+
+
+def file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return bytes_digest(f.read())
+
+
+def bytes_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _read_questions(xls) -> pd.DataFrame:
+    preguntas = pd.read_excel(xls, "Preguntas")
+    preguntas["id"] = preguntas["id"].astype(int)
+    preguntas["categoria"] = preguntas["categoria"].astype(str)
+    preguntas["tipo"] = preguntas["tipo"].astype(str)
+    preguntas["puntos"] = preguntas["puntos"].astype(int)
+    preguntas["enunciado"] = preguntas["enunciado"].astype(str)
+    preguntas["opciones"] = preguntas["opciones"].fillna("")
+    preguntas["respuesta_correcta"] = preguntas["respuesta_correcta"].fillna("")
+    return preguntas
+
+
+def parse_code_tests(df) -> dict:
+    """Hoja Tests_PY (id, funcion, entrada, esperado) -> {qid: {"funcion", "tests"}}.
+    `entrada` es la lista JSON de argumentos y `esperado` el valor JSON devuelto."""
+    out = {}
+    if df is None or df.empty:
+        return out
+    for row in df.itertuples(index=False):
+        qid = int(row.id)
+        spec = out.setdefault(qid, {"funcion": str(row.funcion).strip(), "tests": []})
+        args = json.loads(str(row.entrada))
+        if not isinstance(args, list):
+            args = [args]
+        spec["tests"].append((args, json.loads(str(row.esperado))))
+    return out
+
+
+def parse_sql_references(df) -> dict:
+    """Hoja Tests_SQL (id, consulta) -> {qid: [consultas de referencia]}.
+    Varias filas con el mismo id son resultados alternativos aceptados (p. ej. empates)."""
+    out = {}
+    if df is None or df.empty:
+        return out
+    for row in df.itertuples(index=False):
+        out.setdefault(int(row.id), []).append(str(row.consulta))
+    return out
+
+
+# Pregunta lista para dibujar: opciones ya separadas y letra -> índice de la opción
+LayoutItem = namedtuple("LayoutItem", ["id", "enunciado", "opciones", "letra_idx"])
+
+
+def build_layout(preguntas: pd.DataFrame, opciones: dict) -> dict:
+    """{(categoria, tipo): [LayoutItem]} en el orden del Excel."""
+    layout = {}
+    for r in preguntas.itertuples(index=False):
+        ops = opciones.get(int(r.id), [])
+        letra_idx = {o.split(")", 1)[0].strip().upper(): i for i, o in enumerate(ops) if ")" in o}
+        layout.setdefault((r.categoria, r.tipo), []).append(LayoutItem(int(r.id), r.enunciado, ops, letra_idx))
+    return layout
+
+
+class CompiledBank:
+    """Todo lo que la app y los calificadores necesitan de una versión del banco."""
+
+    def __init__(self, version: str, preguntas: pd.DataFrame, code_tests: dict,
+                 sql_tables: dict, sql_references: dict):
+        self.version = version
+        self.preguntas = preguntas
+        self.opciones = {
+            int(r.id): [o.strip() for o in str(r.opciones).split("|") if o.strip()]
+            for r in preguntas[preguntas["tipo"] == "MCQ"].itertuples(index=False)
+        }
+        self.golden = scoring.golden_table(preguntas)
+        self.layout = build_layout(preguntas, self.opciones)
+        self.code_tests = code_tests
+        self.sql_tables = sql_tables
+        self.sql_references = sql_references
+
+    def group(self, categoria: str, tipo: str) -> list:
+        return self.layout.get((categoria, tipo), [])
+
+
+def compile_bank(path: str, version: str = None) -> CompiledBank:
+    xls = pd.ExcelFile(path)
+    sheets = xls.sheet_names
+    sql_tables = {}
+    for sheet in sheets:
+        if sheet.startswith(SQL_SHEET_PREFIX):
+            df = pd.read_excel(xls, sheet)
+            for c in df.columns:
+                if pd.api.types.is_datetime64_any_dtype(df[c]):
+                    df[c] = df[c].dt.strftime("%Y-%m-%d")
+            sql_tables[sheet[len(SQL_SHEET_PREFIX):]] = df
+    return CompiledBank(
+        version or file_digest(path),
+        _read_questions(xls),
+        parse_code_tests(pd.read_excel(xls, "Tests_PY", dtype=str)) if "Tests_PY" in sheets else {},
+        sql_tables,
+        parse_sql_references(pd.read_excel(xls, "Tests_SQL", dtype=str)) if "Tests_SQL" in sheets else {},
+    )
+
+
+# ---------------- Snapshots en disco + memoria ----------------
+_banks = OrderedDict()   # version -> CompiledBank, del menos al más reciente
+_stats = {}          # path -> (mtime_ns, size, version): evita re-hashear si el archivo no cambió
+_lock = threading.Lock()
+
+
+def _snapshot_path(version: str) -> str:
+    return os.path.join(BANK_CACHE_DIR, f"{version}.v{SNAPSHOT_FORMAT}.pkl")
+
+
+def _write_snapshot(bank: CompiledBank):
+    os.makedirs(BANK_CACHE_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=BANK_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(bank, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, _snapshot_path(bank.version))
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _read_snapshot(version: str):
+    try:
+        with open(_snapshot_path(version), "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+
+
+def bank_version(path: str) -> str:
+    st = os.stat(path)
+    with _lock:
+        cached = _stats.get(path)
+    if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+    version = file_digest(path)
+    with _lock:
+        _stats[path] = (st.st_mtime_ns, st.st_size, version)
+    return version
+
+
+def _remember(bank: CompiledBank):
+    with _lock:
+        _banks[bank.version] = bank
+        _banks.move_to_end(bank.version)
+        while len(_banks) > BANK_MEMORY_SIZE:
+            _banks.popitem(last=False)
+
+
+def archived_path(version: str) -> str:
+    return os.path.join(BANKS_DIR, f"{version}.xlsx")
+
+
+def _archive(path: str, version: str):
+    dst = archived_path(version)
+    if os.path.abspath(path) == os.path.abspath(dst) or os.path.exists(dst):
+        return
+    try:
+        os.makedirs(BANKS_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=BANKS_DIR, suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, dst)
+    except OSError:
+        pass
+
+
+def get_bank(version: str):
+    """Banco compilado por versión: LRU en memoria, snapshot o Excel archivado; None si no existe."""
+    with _lock:
+        bank = _banks.get(version)
+        if bank is not None:
+            _banks.move_to_end(version)
+            return bank
+    bank = _read_snapshot(version)
+    if bank is None and os.path.exists(archived_path(version)):
+        bank = compile_bank(archived_path(version), version)
+        _write_snapshot(bank)
+    if bank is not None:
+        _remember(bank)
+    return bank
+
+
+def load_bank(path: str) -> CompiledBank:
+    """Banco vigente del archivo: snapshot si existe para su hash, si no se compila el Excel."""
+    version = bank_version(path)
+    with _lock:
+        in_memory = version in _banks
+    bank = get_bank(version)
+    if bank is None:
+        bank = compile_bank(path, version)
+        _write_snapshot(bank)
+        _remember(bank)
+    if not in_memory:
+        _archive(path, version)
+    return bank
+
+
+def add_bank(data: bytes) -> CompiledBank:
+    """Agrega una plantilla (p. ej. subida desde la app) sin reemplazar las existentes."""
+    version = bytes_digest(data)
+    path = archived_path(version)
+    if not os.path.exists(path):
+        os.makedirs(BANKS_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=BANKS_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return load_bank(path)
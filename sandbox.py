@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+# Sandbox de Python para las prácticas CODIGO_PY.
+# Mantiene un pool de procesos "calientes" que ejecutan el código del candidato con
+# límites por test de CPU, tiempo real (wall-clock) y memoria. Un proceso colgado
+# (p. ej. un bucle infinito en C) se mata desde el proceso padre y se reemplaza.
+# El filtro de código (check_source) es la primera barrera; además cada worker se aísla a nivel de
+# sistema: sin poder abrir archivos ni sockets nuevos ni crear procesos y, si el servidor corre
+# como root, encerrado en un directorio vacío (chroot) con un usuario sin privilegios.
+
+import ast, atexit, builtins, json, math, os, queue, signal, tempfile, threading
+import multiprocessing as mp
+
+try:
+    import resource  # solo POSIX; en Windows se aplica únicamente el límite del padre
+except ImportError:  # pragma: no cover
+    resource = None
+
+TEST_WALL_SEC = 2.0        # tiempo real máximo por test
+TEST_CPU_SEC = 1           # CPU máximo por test (granularidad de segundos en RLIMIT_CPU)
+MEMORY_LIMIT_MB = 512      # espacio de direcciones máximo por worker
+HARD_DEADLINE_MARGIN = 1.5 # margen del padre antes de matar un worker que no responde
+MAX_REPR = 200
+SANDBOX_UID = 65534        # "nobody": usuario del worker cuando el servidor corre como root
+FD_SCAN = 256              # descriptores revisados al cerrar los huecos antes de limitar RLIMIT_NOFILE
+
+BLOCKED_NAMES = {
+    "open", "exec", "eval", "compile", "input", "globals", "locals", "vars",
+    "getattr", "setattr", "delattr", "breakpoint", "help", "exit", "quit",
+    "memoryview", "dir", "object",
+}
+
+SAFE_BUILTINS = {
+    name: getattr(builtins, name)
+    for name in (
+        "abs", "all", "any", "bool", "chr", "dict", "divmod", "enumerate", "filter", "float",
+        "frozenset", "hash", "int", "isinstance", "issubclass", "iter", "len", "list", "map",
+        "max", "min", "next", "ord", "pow", "range", "repr", "reversed", "round", "set",
+        "slice", "sorted", "str", "sum", "tuple", "type", "zip", "__build_class__",
+        "Exception", "ValueError", "TypeError", "KeyError", "IndexError", "StopIteration",
+        "ZeroDivisionError", "RecursionError", "AttributeError", "NotImplementedError",
+    )
+}
+# Compilado en un espacio vacío: su __globals__ no expone los de este módulo (os, etc.)
+SAFE_BUILTINS["print"] = eval(compile("lambda *a, **k: None", "<sandbox>", "eval"), {"__builtins__": {}})
+# str.format/format_map resuelven atributos desde una cadena armada en tiempo de ejecución
+BLOCKED_ATTRS = {"format", "format_map", "mro"}
+# Introspección de generadores, corrutinas, frames, tracebacks y código (gen.gi_frame.f_back.f_globals
+# llega a los globales del worker): "_" cubre además todos los dunders
+BLOCKED_ATTR_PREFIXES = ("_", "gi_", "cr_", "ag_", "f_", "tb_", "co_")
+
+
+class LimitExceeded(Exception):
+    pass
+
+
+def check_source(code: str):
+    """Valida el código antes de ejecutarlo. Devuelve un mensaje de error o None."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return f"SyntaxError: {e.msg} (línea {e.lineno})"
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            return "No se permite import"
+        if isinstance(node, ast.Global):
+            return "No se permite global"
+        if isinstance(node, ast.Match):
+            # Los patrones de clase leen atributos por nombre (case C(__globals__=g)) sin ast.Attribute
+            return "No se permite match"
+        if isinstance(node, ast.Name) and (node.id in BLOCKED_NAMES or node.id.startswith("__")):
+            return f"Nombre no permitido: {node.id}"
+        if isinstance(node, ast.Attribute) and (node.attr.startswith(BLOCKED_ATTR_PREFIXES)
+                                                or node.attr in BLOCKED_ATTRS):
+            return f"Atributo no permitido: {node.attr}"
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and "__" in node.value:
+            return "No se permiten cadenas con dunders"
+    return None
+
+
+def _short(v) -> str:
+    r = repr(v)
+    return r if len(r) <= MAX_REPR else r[:MAX_REPR] + "…"
+
+
+# ---------------- Proceso worker ----------------
+def _on_limit(signum, frame):
+    raise LimitExceeded("tiempo de CPU excedido" if signum == getattr(signal, "SIGXCPU", None)
+                        else "tiempo excedido")
+
+
+def _arm_limits(wall: float, cpu: int):
+    if hasattr(signal, "setitimer"):
+        signal.setitimer(signal.ITIMER_REAL, wall)
+    if resource is not None:
+        used = resource.getrusage(resource.RUSAGE_SELF)
+        spent = used.ru_utime + used.ru_stime
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = math.ceil(spent) + cpu
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _disarm_limits():
+    if hasattr(signal, "setitimer"):
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    if resource is not None:
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def _run_job(code: str, func_name: str, tests: list, wall: float, cpu: int) -> dict:
+    details, passed, recycle = [], 0, False
+    env = {"__builtins__": dict(SAFE_BUILTINS), "__name__": "candidato"}
+    try:
+        _arm_limits(wall, cpu)
+        try:
+            exec(compile(code, "<candidato>", "exec"), env)
+        finally:
+            _disarm_limits()
+    except MemoryError:
+        return {"passed": 0, "total": len(tests), "recycle": True,
+                "details": [{"ok": False, "error": "memoria excedida al cargar el código"}]}
+    except BaseException as e:
+        return {"passed": 0, "total": len(tests),
+                "details": [{"ok": False, "error": f"{type(e).__name__}: {e}"}]}
+
+    fn = env.get(func_name)
+    if not callable(fn):
+        return {"passed": 0, "total": len(tests),
+                "details": [{"ok": False, "error": f"No se encontró la función {func_name}"}]}
+
+    for args, expected in tests:
+        item = {"entrada": _short(args)}
+        try:
+            _arm_limits(wall, cpu)
+            try:
+                got = fn(*args)
+            finally:
+                _disarm_limits()
+            # Normaliza tuplas/listas igual que el JSON del banco
+            got = json.loads(json.dumps(got, default=str))
+            item["ok"] = got == expected
+            if not item["ok"]:
+                item["obtenido"] = _short(got)
+        except MemoryError:
+            item.update(ok=False, error="memoria excedida")
+            recycle = True
+        except BaseException as e:
+            item.update(ok=False, error=f"{type(e).__name__}: {e}")
+        passed += int(item["ok"])
+        details.append(item)
+    return {"passed": passed, "total": len(tests), "details": details, "recycle": recycle}
+
+
+def _isolate():
+    """Aislamiento del worker a nivel de sistema (mejor esfuerzo según plataforma y privilegios)."""
+    jail = os.path.join(tempfile.gettempdir(), "quiz-sandbox-jail")
+    try:
+        os.makedirs(jail, exist_ok=True)
+        os.chmod(jail, 0o555)
+        os.chdir(jail)   # nada de la app (quiz.db, el Excel) en el directorio de trabajo
+    except OSError:
+        pass
+    if resource is None:
+        return
+    # Los huecos se llenan con /dev/null: con RLIMIT_NOFILE justo sobre el mayor descriptor abierto,
+    # open() y socket() fallan (y un exec no puede cargar bibliotecas)
+    top = 0
+    for fd in range(FD_SCAN):
+        try:
+            os.fstat(fd)
+            top = fd
+        except OSError:
+            pass
+    for fd in range(top):
+        try:
+            os.fstat(fd)
+        except OSError:
+            os.dup2(os.open(os.devnull, os.O_RDONLY), fd)
+    if hasattr(os, "chroot") and os.geteuid() == 0:
+        try:
+            os.chroot(jail)
+            os.chdir("/")
+            os.setgroups([])
+            os.setgid(SANDBOX_UID)
+            os.setuid(SANDBOX_UID)
+        except OSError:
+            pass
+    for limit, value in ((resource.RLIMIT_NOFILE, top + 1), (getattr(resource, "RLIMIT_NPROC", None), 0)):
+        if limit is None:
+            continue
+        try:
+            resource.setrlimit(limit, (value, value))
+        except (ValueError, OSError):
+            pass
+
+
+def _worker_main(conn, memory_mb: int):
+    _isolate()
+    if resource is not None and memory_mb:
+        limit = memory_mb * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError):
+            pass
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _on_limit)
+    if hasattr(signal, "SIGXCPU"):
+        signal.signal(signal.SIGXCPU, _on_limit)
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        try:
+            res = _run_job(*job)
+        except BaseException as e:  # el worker nunca debe morir por el código del candidato
+            res = {"passed": 0, "total": len(job[2]), "recycle": True,
+                   "details": [{"ok": False, "error": f"{type(e).__name__}: {e}"}]}
+        conn.send(res)
+        if res.get("recycle"):
+            break
+
+
+# ---------------- Pool (proceso padre) ----------------
+class _Worker:
+    def __init__(self, ctx, memory_mb: int):
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main, args=(child, memory_mb), daemon=True)
+        self.proc.start()
+        child.close()
+
+    def kill(self):
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.proc.join(timeout=1)
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.proc.join(timeout=1)
+        if self.proc.is_alive():
+            self.proc.kill()
+
+
+class WorkerPool:
+    """Pool de workers reutilizables. `run` es seguro para llamarse desde varios hilos."""
+
+    def __init__(self, size: int = None, memory_mb: int = MEMORY_LIMIT_MB):
+        self.size = size or os.cpu_count() or 2
+        self.memory_mb = memory_mb
+        # spawn: no hereda hilos/conexiones del servidor Streamlit
+        self._ctx = mp.get_context("spawn")
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._all = []
+        self._closed = False
+        for _ in range(self.size):
+            self._add_worker()
+
+    def _add_worker(self):
+        w = _Worker(self._ctx, self.memory_mb)
+        with self._lock:
+            self._all.append(w)
+        self._idle.put(w)
+
+    def _replace(self, w):
+        w.kill()
+        with self._lock:
+            if w in self._all:
+                self._all.remove(w)
+        if not self._closed:
+            self._add_worker()
+
+    def run(self, code: str, func_name: str, tests: list,
+            wall: float = TEST_WALL_SEC, cpu: int = TEST_CPU_SEC) -> dict:
+        err = check_source(code or "")
+        if err:
+            return {"passed": 0, "total": len(tests), "details": [{"ok": False, "error": err}]}
+        if not tests:
+            return {"passed": 0, "total": 0, "details": [{"ok": False, "error": "Sin tests configurados"}]}
+
+        deadline = (len(tests) + 1) * (wall + HARD_DEADLINE_MARGIN)
+        w = self._idle.get()
+        try:
+            w.conn.send((code, func_name, tests, wall, cpu))
+            if w.conn.poll(deadline):
+                res = w.conn.recv()
+                if res.pop("recycle", False):
+                    self._replace(w)
+                else:
+                    self._idle.put(w)
+                return res
+            self._replace(w)
+            return {"passed": 0, "total": len(tests),
+                    "details": [{"ok": False, "error": "Tiempo excedido (proceso detenido)"}]}
+        except (EOFError, OSError, BrokenPipeError):
+            # El worker murió (límite de CPU duro, memoria, señal): se reemplaza
+            self._replace(w)
+            return {"passed": 0, "total": len(tests),
+                    "details": [{"ok": False, "error": "El proceso de evaluación terminó abruptamente"}]}
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            workers, self._all = list(self._all), []
+        for w in workers:
+            w.stop()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> WorkerPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool()
+            atexit.register(_pool.close)
+        return _pool
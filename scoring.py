@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# Puntaje de MCQ y FORMULA_EXCEL por columnas (pandas) en lugar de fila a fila.
+# El mismo motor califica una entrega nueva y recalifica todo el histórico cuando se
+# corrige `respuesta_correcta` en el banco.
+# Uso sin interfaz: python scoring.py --regrade [--db quiz.db] [--bank Cuestionario_Prueba_Tecnica.xlsx | --original]
+
+import argparse, sqlite3
+
+import pandas as pd
+
+import formulas, question_bank, storage
+
+AUTO_TYPES = ["MCQ", "FORMULA_EXCEL"]
+
+
+def golden_table(preguntas: pd.DataFrame) -> pd.DataFrame:
+    """(qid, forma canónica) de cada variante de FORMULA_EXCEL; se compila una vez por banco."""
+    f = preguntas.loc[preguntas["tipo"] == "FORMULA_EXCEL", ["id", "respuesta_correcta"]]
+    v = f.assign(variante=f["respuesta_correcta"].astype(str).str.split("|")).explode("variante")
+    v["variante"] = v["variante"].fillna("").map(formulas.canonical)
+    v = v[v["variante"] != ""]
+    return v.rename(columns={"id": "qid"})[["qid", "variante"]].drop_duplicates()
+
+
+def score_frame(preguntas: pd.DataFrame, responses: pd.DataFrame, golden: pd.DataFrame = None) -> pd.DataFrame:
+    """Califica `responses` (qid, response_text[, submission_id]) contra el banco.
+    Devuelve las mismas filas con is_correct y score_awarded; las preguntas que no son
+    MCQ/FORMULA_EXCEL (o que ya no existen en el banco) se descartan."""
+    if golden is None:
+        golden = golden_table(preguntas)
+    key = preguntas.loc[preguntas["tipo"].isin(AUTO_TYPES), ["id", "tipo", "puntos", "respuesta_correcta"]]
+    df = responses.merge(key, left_on="qid", right_on="id", how="inner")
+    resp = df["response_text"].fillna("").astype(str)
+
+    is_mcq = df["tipo"] == "MCQ"
+    mcq_ok = resp.str.strip().str.upper().str[:1] == df["respuesta_correcta"].astype(str).str.strip().str.upper().str[:1]
+
+    # Solo las fórmulas se canonicalizan (memoizado en formulas.canonical)
+    df["_norm"] = ""
+    df.loc[~is_mcq, "_norm"] = resp[~is_mcq].map(formulas.canonical)
+    hits = df[["qid", "_norm"]].merge(golden, left_on=["qid", "_norm"], right_on=["qid", "variante"],
+                                      how="left", indicator=True)
+    formula_ok = pd.Series((hits["_merge"] == "both").to_numpy(), index=df.index)
+
+    ok = (is_mcq & mcq_ok & (resp.str.strip() != "")) | (~is_mcq & formula_ok)
+    df["is_correct"] = ok.astype(int)
+    df["score_awarded"] = df["puntos"].astype(float).where(ok, 0.0)
+    df["response_text"] = resp
+    return df.drop(columns=["id", "tipo", "puntos", "respuesta_correcta", "_norm"])
+
+
+def score_buffer(preguntas: pd.DataFrame, buffer: dict, golden: pd.DataFrame = None) -> pd.DataFrame:
+    """Una fila por pregunta MCQ/FORMULA_EXCEL del banco, respondida o no."""
+    qids = preguntas.loc[preguntas["tipo"].isin(AUTO_TYPES), "id"].astype(int)
+    responses = pd.DataFrame({"qid": qids.values,
+                              "response_text": [str(buffer.get(q, "")) for q in qids]})
+    return score_frame(preguntas, responses, golden)
+
+
+def regrade_all(con: sqlite3.Connection, preguntas: pd.DataFrame = None, versions=None) -> dict:
+    """Recalifica las respuestas guardadas y actualiza score_total.
+    Con `preguntas` se aplica esa clave a las entregas rendidas con alguna de las `versions` del banco
+    (más las anteriores al versionado, sin versión); `versions=None` la aplica a todo el histórico.
+    Sin `preguntas`, cada entrega se recalifica con la versión contra la que se rindió (si no está
+    registrada, conserva su valor). Todo ocurre en una sola transacción: o se recalifica todo o nada."""
+    stored = pd.read_sql_query("""SELECT a.rowid AS rid, a.submission_id, a.qid, a.response_text, a.is_correct,
+                                         a.score_awarded, s.bank_version
+                                  FROM answers a LEFT JOIN submissions s ON s.id = a.submission_id""", con)
+    if preguntas is not None and versions is not None:
+        # Otra versión puede numerar distinto las preguntas: su clave no se cruza con la vigente
+        stored = stored[stored["bank_version"].isna() | stored["bank_version"].isin(list(versions))]
+    if stored.empty:
+        return {"answers": 0, "changed": 0, "submissions": 0}
+    responses = stored.drop(columns=["is_correct", "score_awarded"])
+    if preguntas is not None:
+        scored = score_frame(preguntas, responses)
+    else:
+        parts = []
+        for version, group in responses.groupby("bank_version"):
+            bank = question_bank.get_bank(version)
+            if bank is not None:
+                parts.append(score_frame(bank.preguntas, group, bank.golden)[["rid", "is_correct", "score_awarded"]])
+        scored = (pd.concat(parts, ignore_index=True) if parts
+                  else stored[["rid"]].iloc[:0].assign(is_correct=0, score_awarded=0.0))
+    merged = stored.merge(scored[["rid", "is_correct", "score_awarded"]], on="rid", how="left", suffixes=("_old", ""))
+    # Respuestas de preguntas que ya no son autocalificables conservan su valor
+    merged["is_correct"] = merged["is_correct"].fillna(merged["is_correct_old"]).astype(int)
+    merged["score_awarded"] = merged["score_awarded"].fillna(merged["score_awarded_old"]).astype(float)
+    changed = merged[(merged["is_correct"] != merged["is_correct_old"]) |
+                     (merged["score_awarded"] != merged["score_awarded_old"])]
+    totals = merged.groupby("submission_id")["score_awarded"].sum()
+
+    with storage.transaction(con):
+        con.executemany("UPDATE answers SET is_correct=?, score_awarded=? WHERE rowid=?",
+                        zip(changed["is_correct"].tolist(), changed["score_awarded"].tolist(), changed["rid"].tolist()))
+        con.executemany("UPDATE submissions SET score_total=? WHERE id=?",
+                        zip(totals.astype(float).tolist(), totals.index.astype(int).tolist()))
+        storage.refresh_summary(con)
+    return {"answers": len(merged), "changed": len(changed), "submissions": len(totals)}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Recalifica todas las entregas con la clave actual del banco (o la original).")
+    ap.add_argument("--regrade", action="store_true", required=True)
+    ap.add_argument("--db", default="quiz.db")
+    ap.add_argument("--bank", default="Cuestionario_Prueba_Tecnica.xlsx")
+    ap.add_argument("--original", action="store_true",
+                    help="recalificar cada entrega con la versión del banco con la que se rindió")
+    ap.add_argument("--all-versions", action="store_true",
+                    help="aplicar la clave de --bank también a entregas rendidas con otras versiones del banco")
+    args = ap.parse_args(argv)
+    preguntas, versions = None, None
+    if not args.original:
+        bank = question_bank.load_bank(args.bank)
+        preguntas, versions = bank.preguntas, None if args.all_versions else [bank.version]
+    with storage.connection(args.db) as con:
+        res = regrade_all(con, preguntas, versions)
+    print(f"Respuestas: {res['answers']} | cambiadas: {res['changed']} | entregas actualizadas: {res['submissions']}")
+
+
+if __name__ == "__main__":
+    main()
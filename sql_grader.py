@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+# Calificación de prácticas SQL_QUERY.
+# Las tablas Datos_SQL_* del banco compilado se cargan una sola vez por versión en una base
+# SQLite plantilla en memoria; cada consulta del candidato corre sobre una copia hecha con la
+# API de backup, con un presupuesto de instrucciones (progress handler) y en solo lectura. El
+# resultado se lee fila a fila con tope de filas y bytes: una sola instrucción puede producir
+# un valor grande, así que el presupuesto de la VM no acota la memoria del resultado.
+
+import hashlib, sqlite3, threading, time
+from collections import Counter, OrderedDict
+
+PROGRESS_STEP = 1000          # instrucciones de la VM entre llamadas al handler
+INSTRUCTION_BUDGET = 2_000_000
+QUERY_WALL_SEC = 2.0
+FLOAT_DIGITS = 6
+MAX_VALUE_BYTES = 1_000_000   # largo máximo de un texto/blob: una sola instrucción puede reservar GBs
+RESULT_FACTOR = 10            # tope del resultado: 10x el mayor resultado de referencia...
+MIN_RESULT_ROWS = 1_000       # ...y nunca menos que esto
+MIN_RESULT_BYTES = 1_000_000
+
+# Solo lectura: cualquier otra acción (INSERT, DROP, ATTACH, PRAGMA...) se rechaza
+_ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION,
+                    getattr(sqlite3, "SQLITE_RECURSIVE", 33)}
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def _norm_value(v):
+    if v is None:
+        return None
+    if isinstance(v, (int, float)):
+        f = round(float(v), FLOAT_DIGITS)
+        return int(f) if f.is_integer() else f
+    if isinstance(v, bytes):
+        return v.hex()
+    return str(v).strip()
+
+
+def fingerprint(rows: list) -> Counter:
+    """Multiconjunto de hashes por fila: el orden de las filas no importa."""
+    return Counter(
+        hashlib.blake2b(repr(tuple(_norm_value(v) for v in r)).encode("utf-8"), digest_size=16).digest()
+        for r in rows
+    )
+
+
+_DENIED_FUNCTIONS = {"randomblob", "zeroblob"}
+
+
+def _authorizer(action, arg1, arg2, *args):
+    if action == sqlite3.SQLITE_FUNCTION and (arg2 or "").lower() in _DENIED_FUNCTIONS:
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK if action in _ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+
+
+def _row_bytes(row) -> int:
+    return sum(len(v) if isinstance(v, (str, bytes)) else 8 for v in row)
+
+
+def _single_statement(sql: str) -> str:
+    # SQLite rechaza por sí mismo más de una sentencia en execute()
+    sql = (sql or "").strip().rstrip(";").strip()
+    if not sql:
+        raise ValueError("Consulta vacía")
+    return sql
+
+
+class SqlTemplate:
+    """Base plantilla de una versión del banco y resultados esperados por pregunta."""
+
+    def __init__(self, tables: dict, references: dict):
+        self._lock = threading.Lock()
+        self.con = sqlite3.connect(":memory:", check_same_thread=False)
+        for name, df in tables.items():
+            df.to_sql(name, self.con, index=False)
+        self.con.commit()
+        self.tables = sorted(tables)
+        # qid -> [(n_columnas, fingerprint)] (una entrada por consulta de referencia aceptada)
+        self.expected = {}
+        self.expected_digest = {}   # qid -> hash de los resultados esperados (clave de grade_cache)
+        self.max_rows, self.max_bytes = MIN_RESULT_ROWS, MIN_RESULT_BYTES
+        for qid, queries in references.items():
+            self.expected[qid] = []
+            for q in queries:
+                cols, rows = self.run(q, budget=None)
+                self.expected[qid].append((cols, fingerprint(rows)))
+                self.max_rows = max(self.max_rows, RESULT_FACTOR * len(rows))
+                self.max_bytes = max(self.max_bytes, RESULT_FACTOR * sum(map(_row_bytes, rows)))
+            h = hashlib.blake2b(digest_size=16)
+            for cols, fp in sorted((c, sorted(f.items())) for c, f in self.expected[qid]):
+                h.update(repr((cols, fp)).encode("utf-8"))
+            self.expected_digest[qid] = h.hexdigest()
+
+    def clone(self) -> sqlite3.Connection:
+        dst = sqlite3.connect(":memory:")
+        with self._lock:
+            self.con.backup(dst)
+        return dst
+
+    def run(self, sql: str, budget=INSTRUCTION_BUDGET, wall: float = QUERY_WALL_SEC,
+            max_rows: int = None, max_bytes: int = None):
+        sql = _single_statement(sql)
+        con = self.clone()
+        try:
+            con.set_authorizer(_authorizer)
+            con.setlimit(sqlite3.SQLITE_LIMIT_LENGTH, MAX_VALUE_BYTES)
+            t0 = time.perf_counter()
+            if budget:
+                state = {"steps": 0}
+                max_steps = budget // PROGRESS_STEP
+
+                def _progress():
+                    state["steps"] += 1
+                    return int(state["steps"] > max_steps or time.perf_counter() - t0 > wall)
+
+                con.set_progress_handler(_progress, PROGRESS_STEP)
+            rows, size = [], 0
+            try:
+                cur = con.execute(sql)
+                # Fila a fila: el plazo también corre mientras Python materializa el resultado
+                for row in cur:
+                    rows.append(row)
+                    size += _row_bytes(row)
+                    if (max_rows and len(rows) > max_rows) or (max_bytes and size > max_bytes):
+                        raise QueryBudgetExceeded("El resultado de la consulta excede el tamaño permitido")
+                    if budget and time.perf_counter() - t0 > wall:
+                        raise QueryBudgetExceeded("La consulta excedió el presupuesto de ejecución")
+            except sqlite3.OperationalError as e:
+                if budget and "interrupted" in str(e):
+                    raise QueryBudgetExceeded("La consulta excedió el presupuesto de ejecución") from e
+                raise
+            return len(cur.description or ()), rows
+        finally:
+            con.close()
+
+    def grade(self, qid: int, sql: str) -> dict:
+        expected = self.expected.get(qid)
+        if not expected:
+            return {"passed": 0, "total": 0, "details": [{"ok": False, "error": "Sin resultado esperado configurado"}]}
+        t0 = time.perf_counter()
+        try:
+            cols, rows = self.run(sql, max_rows=self.max_rows, max_bytes=self.max_bytes)
+        except (sqlite3.Error, ValueError, QueryBudgetExceeded) as e:
+            return {"passed": 0, "total": 1, "details": [{"ok": False, "error": str(e)}]}
+        fp = fingerprint(rows)
+        ok = any(cols == c and fp == f for c, f in expected)
+        item = {"ok": ok, "filas": len(rows), "columnas": cols,
+                "ms": round((time.perf_counter() - t0) * 1000, 2)}
+        if not ok:
+            item["esperado"] = f"{expected[0][0]} columnas, {sum(expected[0][1].values())} filas"
+        return {"passed": int(ok), "total": 1, "details": [item]}
+
+
+TEMPLATE_CACHE_SIZE = 8   # plantillas en memoria (LRU), igual que los bancos compilados
+_templates = OrderedDict()
+_templates_lock = threading.Lock()
+
+
+def get_template(bank) -> SqlTemplate:
+    # Una plantilla por versión (hash) del banco compilado
+    with _templates_lock:
+        tpl = _templates.get(bank.version)
+        if tpl is None:
+            tpl = _templates[bank.version] = SqlTemplate(bank.sql_tables, bank.sql_references)
+            while len(_templates) > TEMPLATE_CACHE_SIZE:
+                _templates.popitem(last=False)
+        _templates.move_to_end(bank.version)
+        return tpl
@@ -0,0 +1,538 @@
+# -*- coding: utf-8 -*-
+# Capa de almacenamiento SQLite (quiz.db).
+# - Pool de conexiones por archivo, compartido por todo el proceso: cada rerun (que Streamlit corre
+#   en un hilo nuevo) y cada hilo de fondo toma una con `with connection(db_file) as con:` y la
+#   devuelve al salir. sqlite3 cachea las sentencias preparadas por conexión, así que los helpers
+#   de abajo no se recompilan en cada uso.
+# - WAL + busy_timeout + synchronous=NORMAL: lectores no bloquean al escritor y los escritores
+#   esperan en vez de fallar con "database is locked".
+# - Esquema versionado con PRAGMA user_version; las migraciones corren una vez por proceso.
+# - submission_summary y kpi_rollup se actualizan en la misma transacción que cada escritura,
+#   así el dashboard lee filas ya agregadas en vez de reescanear answers/coding.
+
+import os, queue, sqlite3, threading, time
+from contextlib import contextmanager
+from datetime import datetime
+
+BUSY_TIMEOUT_MS = 10_000
+POOL_IDLE_MAX = 8   # conexiones ociosas que se conservan por archivo; las demás se cierran al devolverse
+
+# Resumen por entrega recalculado desde las tablas base (backfill y recalificación)
+_SUMMARY_REFRESH = """
+    INSERT OR REPLACE INTO submission_summary(
+        submission_id, user_id, buenas, malas, puntos_obtenidos, tests_ok, tests_total, puntos_code,
+        score_total, score_total_final, duration_sec, started_at, finished_at)
+    SELECT s.id, s.user_id, COALESCE(a.buenas, 0), COALESCE(a.malas, 0), COALESCE(a.puntos, 0),
+           COALESCE(c.ok, 0), COALESCE(c.total, 0), COALESCE(c.puntos, 0),
+           COALESCE(s.score_total, 0), COALESCE(s.score_total, 0) + COALESCE(c.puntos, 0),
+           s.duration_sec, s.started_at, s.finished_at
+    FROM submissions s
+    LEFT JOIN (SELECT submission_id, SUM(is_correct = 1) AS buenas, SUM(is_correct = 0) AS malas,
+                      SUM(score_awarded) AS puntos
+               FROM answers GROUP BY submission_id) a ON a.submission_id = s.id
+    LEFT JOIN (SELECT submission_id, SUM(passed_tests) AS ok, SUM(total_tests) AS total,
+                      SUM(score_awarded) AS puntos
+               FROM coding GROUP BY submission_id) c ON c.submission_id = s.id
+"""
+_KPI_REFRESH = """
+    INSERT OR REPLACE INTO kpi_rollup(id, candidatos, entregas, sum_score, sum_duration)
+    SELECT 1, (SELECT COUNT(*) FROM users WHERE role = 'candidato'), COUNT(*),
+           COALESCE(SUM(score_total), 0), COALESCE(SUM(duration_sec), 0)
+    FROM submissions
+"""
+# Sumas corridas por pregunta para el análisis de ítems (item_analysis.py). `rest` es el puntaje
+# de la entrega sin esa pregunta (point-biserial corregido); `dur` la duración de la entrega.
+_ITEM_STATS_REFRESH = """
+    INSERT INTO item_stats(qid, n, n_correct, sum_rest, sum_rest_sq, sum_rest_correct,
+                           sum_dur, sum_dur_sq, sum_dur_correct)
+    SELECT a.qid, COUNT(*), SUM(a.is_correct = 1),
+           SUM(s.score_total - a.score_awarded), SUM((s.score_total - a.score_awarded) * (s.score_total - a.score_awarded)),
+           SUM(CASE WHEN a.is_correct = 1 THEN s.score_total - a.score_awarded ELSE 0 END),
+           SUM(s.duration_sec), SUM(s.duration_sec * s.duration_sec),
+           SUM(CASE WHEN a.is_correct = 1 THEN s.duration_sec ELSE 0 END)
+    FROM answers a JOIN submissions s ON s.id = a.submission_id
+    GROUP BY a.qid
+"""
+_ITEM_OPTIONS_REFRESH = """
+    INSERT INTO item_options(qid, opcion, n)
+    SELECT qid, UPPER(SUBSTR(TRIM(COALESCE(response_text, '')), 1, 1)), COUNT(*)
+    FROM answers GROUP BY 1, 2
+"""
+_ITEM_STATS_UPSERT = """
+    INSERT INTO item_stats(qid, n, n_correct, sum_rest, sum_rest_sq, sum_rest_correct,
+                           sum_dur, sum_dur_sq, sum_dur_correct)
+    VALUES (?, 1, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(qid) DO UPDATE SET
+        n = n + 1, n_correct = n_correct + excluded.n_correct,
+        sum_rest = sum_rest + excluded.sum_rest, sum_rest_sq = sum_rest_sq + excluded.sum_rest_sq,
+        sum_rest_correct = sum_rest_correct + excluded.sum_rest_correct,
+        sum_dur = sum_dur + excluded.sum_dur, sum_dur_sq = sum_dur_sq + excluded.sum_dur_sq,
+        sum_dur_correct = sum_dur_correct + excluded.sum_dur_correct
+"""
+
+# Cada migración lleva el esquema de la versión N-1 a la N. Solo se agregan al final.
+MIGRATIONS = [
+    # 1: esquema original
+    [
+        """CREATE TABLE IF NOT EXISTS users(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT, email TEXT, doc TEXT,
+            role TEXT,  -- 'candidato' o 'administrador'
+            created_at TEXT
+        )""",
+        """CREATE TABLE IF NOT EXISTS submissions(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            started_at TEXT,
+            finished_at TEXT,
+            duration_sec REAL,
+            score_total REAL,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS answers(
+            submission_id INTEGER,
+            qid INTEGER,
+            response_text TEXT,
+            is_correct INTEGER,
+            score_awarded REAL,
+            FOREIGN KEY(submission_id) REFERENCES submissions(id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS coding(
+            submission_id INTEGER,
+            task_type TEXT,   -- 'PY' o 'SQL'
+            task_id INTEGER,
+            passed_tests INTEGER,
+            total_tests INTEGER,
+            details TEXT,
+            score_awarded REAL,
+            FOREIGN KEY(submission_id) REFERENCES submissions(id)
+        )""",
+        # Borradores (auto-guardado)
+        """CREATE TABLE IF NOT EXISTS draft_answers(
+            user_id INTEGER,
+            qid INTEGER,
+            response_text TEXT,
+            updated_at TEXT,
+            PRIMARY KEY(user_id, qid)
+        )""",
+    ],
+    # 2: índices + resumen por entrega y KPIs mantenidos en cada escritura
+    [
+        "CREATE INDEX IF NOT EXISTS idx_answers_submission ON answers(submission_id)",
+        "CREATE INDEX IF NOT EXISTS idx_coding_submission ON coding(submission_id)",
+        "CREATE INDEX IF NOT EXISTS idx_users_role ON users(role)",
+        """CREATE TABLE IF NOT EXISTS submission_summary(
+            submission_id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            buenas INTEGER DEFAULT 0,
+            malas INTEGER DEFAULT 0,
+            puntos_obtenidos REAL DEFAULT 0,
+            tests_ok INTEGER DEFAULT 0,
+            tests_total INTEGER DEFAULT 0,
+            puntos_code REAL DEFAULT 0,
+            score_total REAL DEFAULT 0,
+            score_total_final REAL DEFAULT 0,
+            duration_sec REAL,
+            started_at TEXT,
+            finished_at TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_summary_user ON submission_summary(user_id)",
+        """CREATE TABLE IF NOT EXISTS kpi_rollup(
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            candidatos INTEGER, entregas INTEGER, sum_score REAL, sum_duration REAL
+        )""",
+        _SUMMARY_REFRESH,
+        _KPI_REFRESH,
+    ],
+    # 3: sumas corridas por pregunta (análisis de ítems)
+    [
+        """CREATE TABLE IF NOT EXISTS item_stats(
+            qid INTEGER PRIMARY KEY,
+            n INTEGER, n_correct INTEGER,
+            sum_rest REAL, sum_rest_sq REAL, sum_rest_correct REAL,
+            sum_dur REAL, sum_dur_sq REAL, sum_dur_correct REAL
+        )""",
+        """CREATE TABLE IF NOT EXISTS item_options(
+            qid INTEGER, opcion TEXT, n INTEGER,
+            PRIMARY KEY(qid, opcion)
+        )""",
+        _ITEM_STATS_REFRESH,
+        _ITEM_OPTIONS_REFRESH,
+    ],
+    # 4: recibo de la cola de envíos (submissions.py): hace idempotente el reintento/recuperación
+    [
+        "ALTER TABLE submissions ADD COLUMN receipt TEXT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_submissions_receipt ON submissions(receipt)",
+    ],
+    # 5: varias versiones del banco; cada entrega recuerda contra cuál se rindió
+    [
+        """CREATE TABLE IF NOT EXISTS banks(
+            version TEXT PRIMARY KEY,
+            label TEXT,
+            created_at TEXT
+        )""",
+        "ALTER TABLE submissions ADD COLUMN bank_version TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_submissions_bank ON submissions(bank_version)",
+    ],
+    # 6: caché de calificación por contenido (grade_cache.py)
+    [
+        """CREATE TABLE IF NOT EXISTS grade_cache(
+            key TEXT PRIMARY KEY,
+            task_type TEXT,
+            task_id INTEGER,
+            passed INTEGER,
+            total INTEGER,
+            details TEXT,
+            hits INTEGER DEFAULT 0,
+            last_used REAL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_grade_cache_used ON grade_cache(last_used)",
+    ],
+    # 7: pruebas abiertas al registro (las elige el administrador); al migrar queda abierta solo la vigente
+    [
+        "ALTER TABLE banks ADD COLUMN active INTEGER NOT NULL DEFAULT 0",
+        "UPDATE banks SET active = 1 WHERE rowid = (SELECT rowid FROM banks ORDER BY created_at DESC, rowid DESC LIMIT 1)",
+    ],
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+_pools = {}            # db_file -> queue.Queue de conexiones ociosas
+_pools_lock = threading.Lock()
+_local = threading.local()   # conexiones prestadas al hilo actual (un checkout anidado reutiliza la suya)
+_migrated = set()
+_migrate_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_lock_waits = {"n": 0, "total_sec": 0.0, "max_sec": 0.0}   # espera en BEGIN IMMEDIATE
+
+
+def _connect(db_file: str) -> sqlite3.Connection:
+    # isolation_level=None: las transacciones se abren explícitamente con transaction()
+    # check_same_thread=False: la conexión vuelve al pool y la toma otro hilo (nunca dos a la vez)
+    con = sqlite3.connect(db_file, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None, check_same_thread=False)
+    con.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    con.execute("PRAGMA synchronous=NORMAL")
+    return con
+
+
+def migrate(con: sqlite3.Connection):
+    current = con.execute("PRAGMA user_version").fetchone()[0]
+    if current == 0:
+        # Solo surte efecto antes de crear tablas: permite PRAGMA incremental_vacuum (maintenance.py)
+        con.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    con.execute("PRAGMA journal_mode=WAL")
+    for version in range(current + 1, SCHEMA_VERSION + 1):
+        with transaction(con):
+            # Otro proceso (réplica) pudo aplicarla mientras se esperaba el lock de escritura
+            if con.execute("PRAGMA user_version").fetchone()[0] >= version:
+                continue
+            for stmt in MIGRATIONS[version - 1]:
+                con.execute(stmt)
+            con.execute(f"PRAGMA user_version={version}")
+
+
+def _pool(db_file: str) -> queue.Queue:
+    with _pools_lock:
+        pool = _pools.get(db_file)
+        if pool is None:
+            pool = _pools[db_file] = queue.Queue(maxsize=POOL_IDLE_MAX)
+        return pool
+
+
+@contextmanager
+def connection(db_file: str):
+    """Presta una conexión del pool de `db_file` durante el bloque (el esquema se migra una vez por
+    proceso). Dentro del bloque, otro connection() del mismo hilo recibe la misma conexión."""
+    held = getattr(_local, "held", None)
+    if held is None:
+        held = _local.held = {}
+    if db_file in held:
+        yield held[db_file]
+        return
+    pool = _pool(db_file)
+    try:
+        con = pool.get_nowait()
+    except queue.Empty:
+        con = _connect(db_file)
+    if db_file not in _migrated:
+        with _migrate_lock:
+            if db_file not in _migrated:
+                migrate(con)
+                _migrated.add(db_file)
+    held[db_file] = con
+    try:
+        yield con
+    finally:
+        del held[db_file]
+        if con.in_transaction:
+            con.rollback()
+        try:
+            pool.put_nowait(con)
+        except queue.Full:
+            con.close()
+
+
+@contextmanager
+def transaction(con: sqlite3.Connection):
+    # IMMEDIATE toma el lock de escritura al inicio: evita el SQLITE_BUSY sin reintento que
+    # ocurre cuando dos transacciones diferidas intentan pasar de lectura a escritura.
+    if con.in_transaction:
+        yield con
+        return
+    t0 = time.perf_counter()
+    con.execute("BEGIN IMMEDIATE")
+    waited = time.perf_counter() - t0
+    with _stats_lock:
+        _lock_waits["n"] += 1
+        _lock_waits["total_sec"] += waited
+        _lock_waits["max_sec"] = max(_lock_waits["max_sec"], waited)
+    try:
+        yield con
+    except BaseException:
+        con.execute("ROLLBACK")
+        raise
+    con.execute("COMMIT")
+
+
+def lock_wait_stats(reset: bool = False) -> dict:
+    """Transacciones abiertas y tiempo esperando el lock de escritura (todas las bases del proceso)."""
+    with _stats_lock:
+        out = dict(_lock_waits)
+        if reset:
+            _lock_waits.update(n=0, total_sec=0.0, max_sec=0.0)
+    return out
+
+
+def now_iso() -> str:
+    return datetime.utcnow().isoformat()
+
+
+# ---------------- Escrituras ----------------
+def insert_user(con, name: str, email: str, doc: str, role: str) -> int:
+    with transaction(con):
+        if role == "administrador":
+            # Cada ingreso al dashboard reutiliza la fila del mismo administrador
+            row = con.execute("""SELECT MIN(id) FROM users WHERE role = 'administrador'
+                                 AND name IS ? AND email IS ? AND doc IS ?""", (name, email, doc)).fetchone()
+            if row[0] is not None:
+                return row[0]
+        cur = con.execute("INSERT INTO users(name,email,doc,role,created_at) VALUES (?,?,?,?,?)",
+                          (name, email, doc, role, now_iso()))
+        if role == "candidato":
+            con.execute("UPDATE kpi_rollup SET candidatos = candidatos + 1 WHERE id = 1")
+    return cur.lastrowid
+
+
+def insert_submission(con, user_id: int, started_at: float, finished_at: float, score_total: float, answers: list,
+                      receipt: str = None, bank_version: str = None) -> int:
+    """Entrega + sus respuestas + resumen/KPIs/ítems en una sola transacción.
+    `answers`: [(qid, texto, is_correct, puntos)]."""
+    rows = [(int(q), str(t), int(ok), float(p)) for q, t, ok, p in answers]
+    started = datetime.utcfromtimestamp(started_at).isoformat()
+    finished = datetime.utcfromtimestamp(finished_at).isoformat()
+    duration = finished_at - started_at
+    with transaction(con):
+        cur = con.execute(
+            """INSERT INTO submissions(user_id, started_at, finished_at, duration_sec, score_total, receipt, bank_version)
+               VALUES (?,?,?,?,?,?,?)""",
+            (user_id, started, finished, duration, score_total, receipt, bank_version))
+        sub_id = cur.lastrowid
+        con.executemany(
+            "INSERT INTO answers(submission_id,qid,response_text,is_correct,score_awarded) VALUES (?,?,?,?,?)",
+            [(sub_id,) + r for r in rows])
+        con.execute(
+            """INSERT INTO submission_summary(submission_id, user_id, buenas, malas, puntos_obtenidos,
+                   score_total, score_total_final, duration_sec, started_at, finished_at)
+               VALUES (?,?,?,?,?,?,?,?,?,?)""",
+            (sub_id, user_id, sum(r[2] == 1 for r in rows), sum(r[2] == 0 for r in rows),
+             sum(r[3] for r in rows), score_total, score_total, duration, started, finished))
+        con.execute("""UPDATE kpi_rollup SET entregas = entregas + 1, sum_score = sum_score + ?,
+                       sum_duration = sum_duration + ? WHERE id = 1""", (score_total, duration))
+        con.executemany(_ITEM_STATS_UPSERT, [
+            (q, ok, score_total - p, (score_total - p) ** 2, (score_total - p) * ok,
+             duration, duration ** 2, duration * ok) for q, _, ok, p in rows])
+        con.executemany("""INSERT INTO item_options(qid, opcion, n) VALUES (?, ?, 1)
+                           ON CONFLICT(qid, opcion) DO UPDATE SET n = n + 1""",
+                        [(q, t.strip().upper()[:1]) for q, t, _, _ in rows])
+    return sub_id
+
+
+def insert_coding(con, submission_id: int, task_type: str, task_id: int, passed: int, total: int,
+                  details: str, score: float):
+    with transaction(con):
+        con.execute("""INSERT INTO coding(submission_id, task_type, task_id, passed_tests, total_tests, details, score_awarded)
+                       VALUES (?,?,?,?,?,?,?)""",
+                    (submission_id, task_type, task_id, passed, total, details, score))
+        con.execute("""UPDATE submission_summary SET tests_ok = tests_ok + ?, tests_total = tests_total + ?,
+                       puntos_code = puntos_code + ?, score_total_final = score_total_final + ?
+                       WHERE submission_id = ?""", (passed, total, score, score, submission_id))
+
+
+_known_banks = set()   # (db_file, version) ya registradas por este proceso
+
+
+def register_bank(db_file: str, version: str, label: str):
+    """Alta (idempotente) de una versión del banco; escribe solo la primera vez por proceso y base.
+    Una versión nueva queda como la única prueba abierta; las demás se reabren desde el dashboard."""
+    if (db_file, version) in _known_banks:
+        return
+    with connection(db_file) as con, transaction(con):
+        cur = con.execute("INSERT OR IGNORE INTO banks(version, label, created_at, active) VALUES (?,?,?,1)",
+                          (version, label, now_iso()))
+        if cur.rowcount:
+            con.execute("UPDATE banks SET active = 0 WHERE version <> ?", (version,))
+    _known_banks.add((db_file, version))
+
+
+def list_banks(con, active_only: bool = False) -> list:
+    """[(version, label, created_at)] de la más reciente a la más antigua; `active_only`: solo las abiertas."""
+    where = "WHERE active = 1 " if active_only else ""
+    return con.execute(f"SELECT version, label, created_at FROM banks {where}"
+                       "ORDER BY created_at DESC, rowid DESC").fetchall()
+
+
+def set_active_banks(con, versions: list):
+    """Abre al registro exactamente `versions` y cierra las demás."""
+    versions = list(versions)
+    if not versions:
+        raise ValueError("Debe quedar al menos una prueba abierta")
+    with transaction(con):
+        con.execute(f"UPDATE banks SET active = (version IN ({','.join('?' * len(versions))}))", versions)
+
+
+def submission_by_receipt(con, receipt: str):
+    row = con.execute("SELECT id FROM submissions WHERE receipt=?", (receipt,)).fetchone()
+    return row[0] if row else None
+
+
+def submission_bank_version(con, submission_id: int):
+    row = con.execute("SELECT bank_version FROM submissions WHERE id=?", (submission_id,)).fetchone()
+    return row[0] if row else None
+
+
+def graded_tasks(con, submission_id: int) -> set:
+    """(task_type, task_id) ya guardados en `coding` para una entrega."""
+    return set(con.execute("SELECT task_type, task_id FROM coding WHERE submission_id=?", (submission_id,)).fetchall())
+
+
+def upsert_drafts(con, rows: list):
+    """Upsert en lote de borradores: rows = [(user_id, qid, respuesta)]."""
+    now = now_iso()
+    with transaction(con):
+        con.executemany("""
+            INSERT INTO draft_answers(user_id, qid, response_text, updated_at)
+            VALUES (?,?,?,?)
+            ON CONFLICT(user_id, qid) DO UPDATE SET response_text=excluded.response_text, updated_at=excluded.updated_at
+        """, [(int(u), int(q), str(r), now) for u, q, r in rows])
+
+
+def load_drafts(con, user_id: int) -> dict:
+    rows = con.execute("SELECT qid, response_text FROM draft_answers WHERE user_id=?", (user_id,)).fetchall()
+    return {int(qid): resp for (qid, resp) in rows}
+
+
+def refresh_summary(con):
+    """Recalcula resumen, KPIs y sumas por ítem desde las tablas base (tras una recalificación masiva)."""
+    with transaction(con):
+        con.execute(_SUMMARY_REFRESH)
+        refresh_rollups(con)
+
+
+def refresh_rollups(con):
+    """KPIs y sumas por ítem desde las tablas base (el resumen por entrega no cambia)."""
+    with transaction(con):
+        con.execute(_KPI_REFRESH)
+        con.execute("DELETE FROM item_stats")
+        con.execute(_ITEM_STATS_REFRESH)
+        con.execute("DELETE FROM item_options")
+        con.execute(_ITEM_OPTIONS_REFRESH)
+
+
+# ---------------- Archivo (maintenance.py) ----------------
+# Las entregas antiguas se mueven a <db>_archive.db, adjunta como `archive`; users queda en la principal.
+ARCHIVE_TABLES = ("submissions", "answers", "coding", "submission_summary")
+
+
+def archive_key(table: str) -> str:
+    return "id" if table == "submissions" else "submission_id"
+
+
+def archive_path(con) -> str:
+    main = next(row[2] for row in con.execute("PRAGMA database_list") if row[1] == "main")
+    root, ext = os.path.splitext(main)
+    return f"{root}_archive{ext or '.db'}"
+
+
+def attach_archive(con):
+    """Adjunta el archivo (una vez por conexión) y crea o completa sus tablas con las columnas de la principal."""
+    if any(row[1] == "archive" for row in con.execute("PRAGMA database_list")):
+        return
+    con.execute("ATTACH DATABASE ? AS archive", (archive_path(con),))
+    con.execute("PRAGMA archive.journal_mode=WAL")
+    with transaction(con):
+        for table in ARCHIVE_TABLES:
+            have = {row[1] for row in con.execute(f"PRAGMA archive.table_info({table})")}
+            if not have:
+                con.execute(f"CREATE TABLE archive.{table} AS SELECT * FROM main.{table} WHERE 0")
+                key = archive_key(table)
+                con.execute(f"CREATE INDEX IF NOT EXISTS archive.idx_{table}_{key} ON {table}({key})")
+                continue
+            for row in con.execute(f"PRAGMA main.table_info({table})").fetchall():
+                if row[1] not in have:
+                    con.execute(f"ALTER TABLE archive.{table} ADD COLUMN {row[1]} {row[2]}")
+
+
+def table_columns(con, table: str) -> str:
+    return ", ".join(row[1] for row in con.execute(f"PRAGMA main.table_info({table})"))
+
+
+def _source(con, table: str, archived: bool) -> str:
+    # archived=True: la tabla vigente más la archivada (consulta bajo demanda del dashboard)
+    if not archived:
+        return table
+    attach_archive(con)
+    cols = table_columns(con, table)
+    return f"(SELECT {cols} FROM main.{table} UNION ALL SELECT {cols} FROM archive.{table})"
+
+
+# ---------------- Lecturas del dashboard ----------------
+_SUMMARY_SELECT = """
+    SELECT s.submission_id, u.name, u.email, u.doc, s.buenas, s.malas, s.puntos_obtenidos,
+           s.tests_ok, s.tests_total, s.score_total_final, s.duration_sec, s.started_at, s.finished_at
+    FROM {source} s LEFT JOIN users u ON u.id = s.user_id"""
+SUMMARY_SELECT = _SUMMARY_SELECT.format(source="submission_summary")
+
+
+def kpis(con) -> dict:
+    row = con.execute("SELECT candidatos, entregas, sum_score, sum_duration FROM kpi_rollup WHERE id = 1").fetchone()
+    candidatos, entregas, sum_score, sum_duration = row or (0, 0, 0.0, 0.0)
+    return {"candidatos": candidatos, "entregas": entregas,
+            "avg_score": sum_score / entregas if entregas else 0.0,
+            "avg_duration": sum_duration / entregas if entregas else 0.0}
+
+
+def _summary_filter(search: str):
+    if not search:
+        return "", ()
+    like = f"%{search.strip()}%"
+    return "WHERE u.name LIKE ? OR u.email LIKE ? OR u.doc LIKE ?", (like, like, like)
+
+
+def summary_count(con, search: str = "", archived: bool = False) -> int:
+    where, params = _summary_filter(search)
+    return con.execute(f"""SELECT COUNT(*) FROM {_source(con, "submission_summary", archived)} s
+                           LEFT JOIN users u ON u.id = s.user_id {where}""", params).fetchone()[0]
+
+
+def summary_page(con, search: str = "", limit: int = 50, offset: int = 0, archived: bool = False) -> "pd.DataFrame":
+    """Página del resumen por candidato, más recientes primero (limit=-1: todas)."""
+    import pandas as pd   # solo el dashboard: el arranque del candidato no carga pandas
+    where, params = _summary_filter(search)
+    return pd.read_sql_query(f"""{_SUMMARY_SELECT.format(source=_source(con, "submission_summary", archived))}
+        {where}
+        ORDER BY s.submission_id DESC LIMIT ? OFFSET ?""", con, params=params + (int(limit), int(offset)))
+
+
+def submission_answers(con, submission_id: int, archived: bool = False) -> "pd.DataFrame":
+    import pandas as pd
+    return pd.read_sql_query(f"SELECT * FROM {_source(con, 'answers', archived)} WHERE submission_id = ? ORDER BY qid",
+                             con, params=(int(submission_id),))
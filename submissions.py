@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+# Cola de escritura diferida (write-behind) para los envíos de la prueba.
+# "Enviar prueba" ya no escribe en SQLite desde el hilo del script: deja el envío en un diario
+# en disco (un JSON por envío, con fsync y el PID del proceso) y en una cola acotada, y devuelve un
+# recibo al instante. Un hilo escritor toma todo lo pendiente y lo guarda en una sola transacción
+# por base; luego encola la calificación de código/SQL. El diario se borra recién cuando todas las
+# tareas tienen su fila en `coding`. Cada RESCAN_SEC el mismo hilo revisa los diarios y retoma los
+# de procesos que ya no existen o los que este proceso dejó a medias; el recibo (columna única en
+# `submissions`) evita duplicados.
+
+import atexit, json, logging, os, queue, tempfile, threading, time, uuid
+
+import grading, question_bank, storage
+
+log = logging.getLogger(__name__)
+
+PENDING_DIR = ".pending_submissions"
+QUEUE_MAX = 500          # envíos en memoria; si se llena, el script escribe directamente
+ENQUEUE_TIMEOUT_SEC = 2.0
+BATCH_MAX = 100          # envíos por transacción
+RETRY_SEC = 1.0          # espera entre reintentos de un envío (crece con cada intento)
+MAX_ATTEMPTS = 5         # después el envío queda en su diario hasta el próximo arranque
+RESCAN_SEC = 30.0        # revisión periódica de PENDING_DIR desde el hilo escritor
+RECOVER_AGE_SEC = 60.0   # diarios sin PID (versión anterior): más nuevos pueden ser de otro proceso vivo
+
+QUEUED, PERSISTED, GRADED = "en cola", "guardada", "calificada"
+
+
+# ---------------- Diario en disco ----------------
+def _journal_path(receipt: str, directory: str = PENDING_DIR) -> str:
+    return os.path.join(directory, f"{receipt}.json")
+
+
+def _write_journal(item: dict, directory: str = PENDING_DIR):
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(item, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, _journal_path(item["receipt"], directory))
+
+
+def _read_journal(path: str):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _drop_journal(receipt: str, directory: str = PENDING_DIR):
+    try:
+        os.remove(_journal_path(receipt, directory))
+    except FileNotFoundError:
+        pass
+
+
+def _owner_gone(item: dict, path: str) -> bool:
+    """True si el proceso que escribió el diario ya no existe (o es este mismo proceso)."""
+    pid = item.get("pid")
+    if pid is None or os.name == "nt":
+        try:
+            return time.time() - os.path.getmtime(path) >= RECOVER_AGE_SEC
+        except OSError:
+            return False
+    if pid == os.getpid():
+        return True   # el llamador ya descartó los que este proceso tiene en curso
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        return False   # existe pero es de otro usuario
+    return False
+
+
+class _SubmissionWriter:
+    def __init__(self, pending_dir: str = PENDING_DIR):
+        self._dir = pending_dir
+        self._queue = queue.Queue(maxsize=QUEUE_MAX)
+        # recibo -> {"estado", "submission_id", "db_file", "tareas"}; sale al quedar calificada
+        self._status = {}
+        self._inflight = set()   # recibos que este proceso tiene en la cola o calificándose
+        self._failures = {}      # recibo -> intentos fallidos; sale al calificarse o si el diario desaparece
+        self._lock = threading.Lock()
+        self._next_scan = 0.0
+        self._thread = threading.Thread(target=self._run, name="submission-writer", daemon=True)
+        self._thread.start()
+
+    def _set(self, receipt: str, **kw):
+        with self._lock:
+            self._status.setdefault(receipt, {}).update(kw)
+
+    def enqueue(self, db_file: str, user_id: int, started_at: float, finished_at: float,
+                score_total: float, answers: list, tasks: list, bank_version: str = None) -> str:
+        """Registra el envío y retorna su recibo. Queda en disco antes de retornar."""
+        receipt = uuid.uuid4().hex
+        item = {"receipt": receipt, "db_file": db_file, "user_id": int(user_id),
+                "started_at": started_at, "finished_at": finished_at, "score_total": float(score_total),
+                "answers": [[int(q), str(t), int(ok), float(p)] for q, t, ok, p in answers], "tasks": tasks,
+                "bank_version": bank_version, "pid": os.getpid()}
+        with self._lock:
+            self._inflight.add(receipt)   # antes del diario: la revisión periódica no debe tomarlo
+        _write_journal(item, self._dir)
+        self._set(receipt, estado=QUEUED, submission_id=None, db_file=db_file, tareas=len(tasks))
+        try:
+            self._queue.put(item, timeout=ENQUEUE_TIMEOUT_SEC)
+        except queue.Full:
+            # Contrapresión: se escribe en este hilo; si la base tampoco responde, se espera lugar en la cola
+            try:
+                self._write([item])
+            except Exception:
+                self._queue.put(item)
+        return receipt
+
+    def _write(self, batch: list):
+        by_db = {}
+        for item in batch:
+            by_db.setdefault(item["db_file"], []).append(item)
+        for db_file, items in by_db.items():
+            with storage.connection(db_file) as con:
+                saved = []
+                with storage.transaction(con):
+                    for item in items:
+                        sub_id = storage.submission_by_receipt(con, item["receipt"])
+                        if sub_id is None:
+                            sub_id = storage.insert_submission(
+                                con, item["user_id"], item["started_at"], item["finished_at"],
+                                item["score_total"], item["answers"], receipt=item["receipt"],
+                                bank_version=item.get("bank_version"))
+                        saved.append((item, sub_id))
+                for item, sub_id in saved:
+                    if item.get("_grading"):
+                        continue   # reintento de un lote: esta ya quedó encolada
+                    # Solo las tareas que aún no están en `coding` (importa al recuperar un diario)
+                    done = storage.graded_tasks(con, sub_id)
+                    pending = [t for t in item["tasks"] if (t["task_type"], t["qid"]) not in done]
+                    self._set(item["receipt"], estado=PERSISTED, submission_id=sub_id, db_file=db_file,
+                              tareas=len(item["tasks"]))
+                    try:
+                        futures = grading.submit_grading(db_file, sub_id, pending)
+                    except RuntimeError:
+                        # Apagado del intérprete: el diario queda y la calificación se retoma al arrancar
+                        continue
+                    item["_grading"] = True
+                    self._track_grading(item["receipt"], futures)
+
+    def _track_grading(self, receipt: str, futures: list):
+        # El diario se borra cuando todas las tareas quedaron en `coding`
+        left = [len(futures)]
+        left_lock = threading.Lock()
+
+        def _done(_):
+            with left_lock:
+                left[0] -= 1
+                last = left[0] == 0
+            if last:
+                self._graded(receipt, futures)
+
+        if not futures:
+            self._graded(receipt, futures)
+        for f in futures:
+            f.add_done_callback(_done)
+
+    def _graded(self, receipt: str, futures: list):
+        errors = [f.exception() for f in futures if f.exception() is not None]
+        if errors:
+            self._failed(receipt, errors[0], "calificación")
+            return
+        _drop_journal(receipt, self._dir)
+        # Calificada: status() la reconstruye desde la base si se vuelve a consultar
+        with self._lock:
+            self._status.pop(receipt, None)
+            self._inflight.discard(receipt)
+            self._failures.pop(receipt, None)
+
+    def _failed(self, receipt: str, error: BaseException, stage: str, give_up: bool = False):
+        """Registra un intento fallido; el diario queda y la revisión periódica lo retoma hasta MAX_ATTEMPTS."""
+        with self._lock:
+            n = self._failures.get(receipt, 0) + 1
+            self._failures[receipt] = n = MAX_ATTEMPTS if give_up else n
+            self._inflight.discard(receipt)
+        if n >= MAX_ATTEMPTS:
+            log.error("Envío %s: falló la %s tras %d intentos (%s); queda en %s hasta el próximo arranque",
+                      receipt, stage, MAX_ATTEMPTS, error, self._dir)
+        else:
+            log.warning("Envío %s: falló la %s (intento %d de %d): %s", receipt, stage, n, MAX_ATTEMPTS, error)
+
+    def _write_each(self, batch: list):
+        # Uno por uno: un envío que falla no retiene al resto del lote
+        pending = list(batch)
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            failed = []
+            for item in pending:
+                try:
+                    self._write([item])
+                except Exception as e:
+                    log.warning("Envío %s: falló la escritura (intento %d de %d): %s",
+                                item["receipt"], attempt, MAX_ATTEMPTS, e)
+                    failed.append((item, e))
+            if not failed:
+                return
+            pending = [item for item, _ in failed]
+            if attempt < MAX_ATTEMPTS:
+                time.sleep(RETRY_SEC * attempt)
+        for item, e in failed:
+            self._failed(item["receipt"], e, "escritura", give_up=True)
+
+    def _run(self):
+        while True:
+            if time.monotonic() >= self._next_scan:
+                try:
+                    self.recover()
+                except Exception as e:
+                    log.warning("No se pudo revisar %s: %s", self._dir, e)
+                self._next_scan = time.monotonic() + RESCAN_SEC
+            try:
+                batch = [self._queue.get(timeout=max(0.0, self._next_scan - time.monotonic()))]
+            except queue.Empty:
+                continue
+            while len(batch) < BATCH_MAX:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                log.warning("Falló la escritura de un lote de %d envíos; se reintenta uno por uno: %s", len(batch), e)
+                self._write_each(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = None) -> bool:
+        """Espera a que la cola quede vacía y escrita. False si se agotó `timeout`."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def pending_count(self) -> int:
+        return self._queue.unfinished_tasks
+
+    def _expected_tasks(self, receipt: str, con, submission_id: int):
+        # Tras un reinicio no hay estado en memoria: se cuentan las tareas del diario o, si ya no
+        # está, las de la versión del banco con la que se rindió
+        item = _read_journal(_journal_path(receipt, self._dir))
+        if item is not None:
+            return len(item["tasks"])
+        version = storage.submission_bank_version(con, submission_id)
+        bank = question_bank.get_bank(version) if version else None
+        if bank is None:
+            return None
+        return len(grading.build_code_tasks(bank, {})) + len(grading.build_sql_tasks(bank, {}))
+
+    def status(self, receipt: str, db_file: str = None) -> dict:
+        """Estado del envío: en cola -> guardada -> calificada (todas sus tareas en `coding`)."""
+        with self._lock:
+            st = dict(self._status.get(receipt, {}))
+        db_file = st.get("db_file") or db_file
+        if not st.get("submission_id") and db_file:
+            with storage.connection(db_file) as con:
+                sub_id = storage.submission_by_receipt(con, receipt)
+            if sub_id is None:
+                return {"estado": QUEUED if st or os.path.exists(_journal_path(receipt, self._dir)) else None,
+                        "submission_id": None}
+            st.update(estado=PERSISTED, submission_id=sub_id)
+        if st.get("estado") == PERSISTED:
+            with storage.connection(db_file) as con:
+                done = len(storage.graded_tasks(con, st["submission_id"]))
+                expected = st.get("tareas")
+                if expected is None:
+                    expected = self._expected_tasks(receipt, con, st["submission_id"])
+            if expected is None:
+                # Sin diario ni banco conocido: el diario solo se borra con todo calificado
+                graded = not os.path.exists(_journal_path(receipt, self._dir))
+            else:
+                graded = done >= expected
+            if graded:
+                st["estado"] = GRADED
+                with self._lock:
+                    self._status.pop(receipt, None)
+        return {"estado": st.get("estado"), "submission_id": st.get("submission_id")}
+
+    def recover(self):
+        """Reencola los diarios de procesos que ya no existen y los que este proceso dejó a medias."""
+        if not os.path.isdir(self._dir):
+            return 0
+        names = [name for name in sorted(os.listdir(self._dir)) if name.endswith(".json")]
+        with self._lock:
+            # Diarios que ya no están (borrados a mano o retomados por otro proceso): nada que recordar
+            present = {name[:-len(".json")] for name in names}
+            for receipt in [r for r in self._failures if r not in present]:
+                del self._failures[receipt]
+        n = 0
+        for name in names:
+            with self._lock:
+                receipt = name[:-len(".json")]
+                if receipt in self._inflight or self._failures.get(receipt, 0) >= MAX_ATTEMPTS:
+                    continue
+            path = os.path.join(self._dir, name)
+            item = _read_journal(path)
+            if item is None or not _owner_gone(item, path):
+                continue
+            with self._lock:
+                if item["receipt"] in self._inflight:
+                    continue
+                self._inflight.add(item["receipt"])
+            self._set(item["receipt"], estado=QUEUED, submission_id=None, db_file=item["db_file"],
+                      tareas=len(item["tasks"]))
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                with self._lock:
+                    self._inflight.discard(item["receipt"])
+                break   # la próxima revisión toma el resto
+            n += 1
+        if n:
+            log.info("Se retomaron %d envíos de %s", n, self._dir)
+        return n
+
+
+_writer = _SubmissionWriter()
+atexit.register(_writer.flush, 30.0)
+
+enqueue = _writer.enqueue
+flush = _writer.flush
+pending_count = _writer.pending_count
+status = _writer.status
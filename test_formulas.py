@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# Tabla de equivalencias de formulas.canonical (calificación de FORMULA_EXCEL).
+
+import pytest
+
+import formulas
+
+SAME = [
+    # nombres de función ES/EN y acentos
+    ("=SUMAR.SI.CONJUNTO(C:C;A:A;\"Norte\")", "=SUMIFS(C:C,A:A,\"Norte\")"),
+    ("=buscarx(A2;A:A;D:D)", "=XLOOKUP(A2,A:A,D:D)"),
+    ("=SI.ERROR(BUSCARV(A2;B:C;2;FALSO);0)", "=IFERROR(VLOOKUP(A2,B:C,2,FALSE),0)"),
+    ("=ÍNDICE(B:B;COINCIDIR(E2;A:A;0))", "=INDEX(B:B,MATCH(E2,A:A,0))"),
+    ("=_xlfn.XLOOKUP(A2,A:A,D:D)", "=XLOOKUP(A2,A:A,D:D)"),
+    # separadores y espacios
+    ("=SUM( A1 , B1 )", "=SUMA(A1;B1)"),
+    # anclas $
+    ("=SUM($A$1:$A$10)", "=SUM(A1:A10)"),
+    # coma decimal
+    ("=ROUND(A1;2)*1,5", "=ROUND(A1,2)*1.5"),
+    ("=A1*1,5", "=A1*1.5"),
+    # punto decimal con separador `;`
+    ("=IF(A1>0;1.5;0)", "=IF(A1>0,1.5,0)"),
+    ("=ROUND(A1;2)*1.5", "=ROUND(A1,2)*1.5"),
+    # paréntesis redundantes y mayúsculas
+    ("=((a1+b1))*2", "=(A1+B1)*2"),
+]
+
+DIFFERENT = [
+    ("=SUM(A1:A10)", "=SUM(A1:A11)"),
+    ("=A1-B1", "=B1-A1"),
+    ("=(A1+B1)*2", "=A1+B1*2"),
+    ("=SUMIF(A:A,\"Norte\",C:C)", "=SUMIF(A:A,\"Sur\",C:C)"),
+]
+
+
+@pytest.mark.parametrize("a,b", SAME)
+def test_equivalent(a, b):
+    assert formulas.canonical(a) == formulas.canonical(b)
+    assert not formulas.canonical(a).startswith("~")
+
+
+@pytest.mark.parametrize("a,b", DIFFERENT)
+def test_not_equivalent(a, b):
+    assert formulas.canonical(a) != formulas.canonical(b)
+
+
+@pytest.mark.parametrize("text", ["=SUM(A1", "=A1 ¤ B1", "=\"sin cerrar"])
+def test_fallback_to_text(text):
+    out = formulas.canonical(text)
+    assert out.startswith("~") and out == formulas.canonical(text.lower())
+
+
+def test_empty():
+    assert formulas.canonical("") == "" and formulas.canonical(None) == ""
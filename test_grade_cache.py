@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# Claves de grade_cache: lo que no cambia el resultado comparte clave; lo que puede cambiarlo, no.
+
+import pytest
+
+import grade_cache, sql_grader
+
+PY_SAME = [
+    ("def f(x):\n    return x + 1\n", "def f(x):  # suma\n\n    return x+1   # fin\n"),
+    ("def f(x):\n    return x + 1\n", "def f(x):\n  return x + 1\n"),
+    ("def f(x):\n    return x + 1\n", "# cabecera\n\n\ndef f( x ):\n    return x  +  1\n"),
+    ("x = 'a' 'b'\n", "x = 'a'    'b'\n"),
+    ("x = f'{a} b'\n", "x = f'{a} b'  # nada\n"),
+]
+
+PY_DIFFERENT = [
+    ("x = 'Hola'\n", "x = 'hola'\n"),
+    ("x = 1.5\n", "x = 1. 5\n"),
+    ("x = f'{a}  b'\n", "x = f'{a} b'\n"),
+    ("x = f'{{a}}'\n", "x = f'{a}'\n"),
+    ("def f(x):\n    return x\n", "def f(x):\n    returnx\n"),
+    ("if a:\n    b()\nc()\n", "if a:\n    b()\n    c()\n"),
+]
+
+SQL_SAME = [
+    ("SELECT a FROM t", "select a\nfrom t;"),
+    ("SELECT a FROM t", "SELECT a -- columnas\n  FROM   t -- fin"),
+    ("SELECT a FROM t", "SELECT /* nada */ a FROM t ;"),
+    ("SELECT Nombre FROM t", "SELECT nombre FROM T"),
+]
+
+SQL_DIFFERENT = [
+    ("SELECT 'A'", "SELECT 'a'"),
+    ("SELECT 1.5", "SELECT 1 . 5"),
+    ('SELECT "Col" FROM t', 'SELECT "col" FROM t'),
+    ("SELECT x'AB'", "SELECT x'ab'"),
+    ("SELECT a/*x*/b FROM t", "SELECT ab FROM t"),
+    ("SELECT 'a  b'", "SELECT 'a b'"),
+]
+
+TESTS = [{"args": [1], "esperado": 2}]
+
+
+def _py(text, tests=TESTS):
+    return {"task_type": "PY", "qid": 301, "text": text, "funcion": "f", "tests": tests}
+
+
+def _sql(text):
+    return {"task_type": "SQL", "qid": 1, "text": text, "bank_version": "v1"}
+
+
+@pytest.fixture
+def templates(monkeypatch):
+    # Banco falso: la plantilla en uso se elige por "ref" sin tocar disco
+    tpl = {"ref": "SELECT 1", "cache": {}}
+
+    def fake_template(bank):
+        ref = tpl["ref"]
+        if ref not in tpl["cache"]:
+            tpl["cache"][ref] = sql_grader.SqlTemplate({}, {1: [ref]})
+        return tpl["cache"][ref]
+
+    monkeypatch.setattr(grade_cache.question_bank, "get_bank", lambda version: object())
+    monkeypatch.setattr(grade_cache.sql_grader, "get_template", fake_template)
+    return tpl
+
+
+@pytest.mark.parametrize("a,b", PY_SAME)
+def test_python_same_key(a, b):
+    assert grade_cache.task_key(_py(a)) == grade_cache.task_key(_py(b))
+
+
+@pytest.mark.parametrize("a,b", PY_DIFFERENT)
+def test_python_different_key(a, b):
+    assert grade_cache.task_key(_py(a)) != grade_cache.task_key(_py(b))
+
+
+@pytest.mark.parametrize("a,b", SQL_SAME)
+def test_sql_same_key(templates, a, b):
+    assert grade_cache.task_key(_sql(a)) == grade_cache.task_key(_sql(b))
+
+
+@pytest.mark.parametrize("a,b", SQL_DIFFERENT)
+def test_sql_different_key(templates, a, b):
+    assert grade_cache.task_key(_sql(a)) != grade_cache.task_key(_sql(b))
+
+
+def test_python_tests_change_key():
+    code = "def f(x):\n    return x + 1\n"
+    other = [{"args": [1], "esperado": 3}]
+    assert grade_cache.task_key(_py(code)) != grade_cache.task_key(_py(code, other))
+
+
+def test_sql_expected_change_key(templates):
+    before = grade_cache.task_key(_sql("SELECT 1"))
+    assert grade_cache.task_key(_sql("SELECT 1")) == before
+    templates["ref"] = "SELECT 2"
+    assert grade_cache.task_key(_sql("SELECT 1")) != before
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Regresiones del sandbox de CODIGO_PY: código que no debe salir del entorno restringido.
+
+import pytest
+
+import sandbox
+
+FRAME_ESCAPE = (
+    "def f():\n"
+    "    def g():\n"
+    "        yield gen.gi_frame.f_back\n"
+    "    gen = g()\n"
+    "    fr = next(gen)\n"
+    "    return [fr.f_back.f_globals['os'].getpid(), fr.f_back.f_builtins['open']('/etc/hostname').read()]\n"
+)
+
+ESCAPES = [
+    # Patrón de clase con atributo dunder como keyword: no pasa por ast.Attribute
+    'O = type(()).mro()[1]\ndef f():\n    match print:\n        case O(__globals__=g):\n            return g["os"].popen("id").read()\n',
+    # format con una cadena armada en tiempo de ejecución
+    'def f():\n    return ("{0." + "_" * 2 + "globals" + "_" * 2 + "}").format(print)\n',
+    'def f():\n    return "{x}".format_map({"x": 1})\n',
+    "def f():\n    return print.__globals__\n",
+    # Frame del generador -> frame del worker -> sus globales (os) y builtins (open)
+    FRAME_ESCAPE,
+    "def f(e):\n    return e.tb_frame.f_globals\n",
+    "def f(c):\n    return c.cr_frame\n",
+    "def f(fn):\n    return fn.co_consts\n",
+    "import os\ndef f():\n    return 1\n",
+]
+
+
+@pytest.mark.parametrize("code", ESCAPES)
+def test_check_source_rejects(code):
+    assert sandbox.check_source(code) is not None
+
+
+def test_print_stub_has_no_module_globals():
+    g = sandbox.SAFE_BUILTINS["print"].__globals__
+    assert "os" not in g and g.get("__builtins__") == {}
+
+
+def test_match_payload_through_pool():
+    pool = sandbox.WorkerPool(size=1)
+    try:
+        res = pool.run(ESCAPES[0], "f", [([], "")])
+        assert res["passed"] == 0
+        assert "uid=" not in repr(res)
+        ok = pool.run("def f(n):\n    return n * 2\n", "f", [([2], 4)])
+        assert ok["passed"] == 1
+    finally:
+        pool.close()
+
+
+def test_worker_isolated_without_source_filter(monkeypatch):
+    # Si el filtro dejara pasar algo, el worker igual no puede abrir archivos de la app
+    monkeypatch.setattr(sandbox, "check_source", lambda code: None)
+    pool = sandbox.WorkerPool(size=1)
+    try:
+        res = pool.run(FRAME_ESCAPE, "f", [([], "")])
+        assert res["passed"] == 0
+        assert "error" in res["details"][0] and "obtenido" not in res["details"][0]
+    finally:
+        pool.close()
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+# Recalificación con la clave vigente: solo las versiones del banco elegidas (y las entregas sin versión).
+
+import pandas as pd
+
+import scoring, storage
+
+PREGUNTAS = pd.DataFrame({"id": [1], "tipo": ["MCQ"], "puntos": [1.0], "respuesta_correcta": ["B"]})
+
+
+def test_regrade_limited_to_versions(tmp_path):
+    db_file = str(tmp_path / "quiz.db")
+    with storage.connection(db_file) as con:
+        uid = storage.insert_user(con, "c", "c@x", "1", "candidato")
+        ids = {v: storage.insert_submission(con, uid, 0.0, 60.0, 0.0, [(1, "B", 0, 0.0)], bank_version=v)
+               for v in ("v1", "v2", None)}
+        res = scoring.regrade_all(con, PREGUNTAS, ["v1"])
+        totals = dict(con.execute("SELECT id, score_total FROM submissions").fetchall())
+    assert res["submissions"] == 2
+    assert totals[ids["v1"]] == 1.0 and totals[ids[None]] == 1.0
+    assert totals[ids["v2"]] == 0.0   # otra versión: no se cruza con esta clave
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Regresiones del calificador SQL: consultas que no deben reservar memoria sin límite.
+
+import pytest
+
+import sql_grader
+
+
+@pytest.fixture(scope="module")
+def template():
+    return sql_grader.SqlTemplate({}, {1: ["SELECT 1"]})
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT length(randomblob(300000000))",
+    "SELECT length(ZEROBLOB(300000000))",
+    "WITH RECURSIVE r(s) AS (SELECT 'x' UNION ALL SELECT s || s FROM r LIMIT 40) SELECT max(length(s)) FROM r",
+])
+def test_large_values_rejected(template, sql):
+    res = template.grade(1, sql)
+    assert res["passed"] == 0 and "error" in res["details"][0]
+
+
+@pytest.mark.parametrize("sql", [
+    # Cada fila es un valor grande producido por una sola instrucción: el presupuesto de la VM no lo frena
+    "WITH RECURSIVE r(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM r LIMIT 50) SELECT printf('%.*c', 900000, 'x') FROM r",
+    "WITH RECURSIVE r(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM r LIMIT 5000) SELECT i FROM r",
+])
+def test_large_results_rejected(template, sql):
+    res = template.grade(1, sql)
+    assert res["passed"] == 0 and "excede el tamaño" in res["details"][0]["error"]
+
+
+def test_plain_query_still_graded(template):
+    assert template.grade(1, "select 1;")["passed"] == 1
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# Pool de conexiones de storage (reutilización entre hilos, checkouts anidados, devolución limpia) y pruebas abiertas.
+
+import sqlite3, threading
+
+import pytest
+
+import storage
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    return str(tmp_path / "quiz.db")
+
+
+def _in_thread(fn):
+    out = []
+    t = threading.Thread(target=lambda: out.append(fn()))
+    t.start()
+    t.join()
+    return out[0]
+
+
+def test_connection_reused_across_threads(db_file):
+    # Streamlit corre cada rerun en un hilo nuevo: la conexión debe volver al pool y reutilizarse
+    def checkout():
+        with storage.connection(db_file) as con:
+            return id(con)
+    assert _in_thread(checkout) == _in_thread(checkout)
+
+
+def test_nested_checkout_same_connection(db_file):
+    with storage.connection(db_file) as con:
+        with storage.connection(db_file) as inner:
+            assert inner is con
+
+
+def test_released_connection_has_no_open_transaction(db_file):
+    with pytest.raises(RuntimeError):
+        with storage.connection(db_file) as con:
+            con.execute("BEGIN IMMEDIATE")
+            raise RuntimeError
+    with storage.connection(db_file) as again:
+        assert again is con and not again.in_transaction
+
+
+def test_new_bank_is_the_only_open_one(db_file):
+    storage.register_bank(db_file, "v1", "base")
+    storage.register_bank(db_file, "v2", "nueva")
+    with storage.connection(db_file) as con:
+        assert [b[0] for b in storage.list_banks(con, active_only=True)] == ["v2"]
+        storage.set_active_banks(con, ["v1", "v2"])
+        assert len(storage.list_banks(con, active_only=True)) == 2
+        with pytest.raises(ValueError):
+            storage.set_active_banks(con, [])
+    storage._known_banks.clear()
+    storage.register_bank(db_file, "v1", "base")   # volver a registrar una versión conocida no cierra las otras
+    with storage.connection(db_file) as con:
+        assert len(storage.list_banks(con, active_only=True)) == 2
+
+
+def test_migration_opens_only_current_bank(tmp_path):
+    db_file = str(tmp_path / "viejo.db")
+    con = sqlite3.connect(db_file)
+    for stmts in storage.MIGRATIONS[:6]:
+        for stmt in stmts:
+            con.execute(stmt)
+    con.executemany("INSERT INTO banks(version, label, created_at) VALUES (?,?,?)",
+                    [("v1", "a", "2024-01-01"), ("v2", "b", "2024-02-01")])
+    con.execute("PRAGMA user_version=6")
+    con.commit()
+    con.close()
+    with storage.connection(db_file) as con:
+        assert storage.list_banks(con, active_only=True) == [("v2", "b", "2024-02-01")]
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# Cola de envíos: diario en disco, reintentos, recuperación de diarios huérfanos y estado tras reiniciar.
+# La calificación se reemplaza por futures ya resueltos; todo corre contra una base y un directorio temporales.
+
+import json, os, sqlite3, subprocess, sys, time
+from concurrent.futures import Future
+
+import pytest
+
+import storage, submissions
+
+TASKS = [{"task_type": "PY", "qid": 301}, {"task_type": "SQL", "qid": 501}]
+ANSWERS = [(101, "A", 1, 1.0)]
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    graded = []
+
+    def fake_submit(db_file, submission_id, tasks):
+        graded.append((submission_id, sorted(t["qid"] for t in tasks)))
+        f = Future()
+        f.set_result(None)
+        return [f]
+
+    monkeypatch.setattr(submissions.grading, "submit_grading", fake_submit)
+    monkeypatch.setattr(submissions, "RETRY_SEC", 0.01)
+    return str(tmp_path / "quiz.db"), str(tmp_path / "pending"), graded
+
+
+def _wait(cond, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "tiempo agotado"
+        time.sleep(0.02)
+
+
+def _rows(db_file, receipt):
+    with storage.connection(db_file) as con:
+        return con.execute("SELECT COUNT(*) FROM submissions WHERE receipt=?", (receipt,)).fetchone()[0]
+
+
+def _dead_pid() -> int:
+    p = subprocess.Popen([sys.executable, "-c", "pass"])
+    p.wait()
+    return p.pid
+
+
+def _journal(pending, receipt, db_file, pid):
+    item = {"receipt": receipt, "db_file": db_file, "user_id": 1, "started_at": 0.0, "finished_at": 60.0,
+            "score_total": 1.0, "answers": [list(a) for a in ANSWERS], "tasks": TASKS,
+            "bank_version": None, "pid": pid}
+    submissions._write_journal(item, pending)
+    return item
+
+
+def test_journal_written_atomically(tmp_path):
+    item = {"receipt": "abc", "tasks": [], "pid": 1}
+    submissions._write_journal(item, str(tmp_path))
+    assert os.listdir(tmp_path) == ["abc.json"]   # sin temporales sueltos
+    assert json.load(open(tmp_path / "abc.json", encoding="utf-8")) == item
+
+
+def test_enqueue_persists_grades_and_forgets(env):
+    db_file, pending, graded = env
+    w = submissions._SubmissionWriter(pending)
+    receipt = w.enqueue(db_file, 1, 0.0, 60.0, 1.0, ANSWERS, TASKS)
+    assert w.flush(10)
+    _wait(lambda: not os.listdir(pending))
+    assert _rows(db_file, receipt) == 1 and len(graded) == 1
+    assert receipt not in w._status and not w._failures
+    assert w.status(receipt, db_file)["estado"] == submissions.GRADED
+
+
+def test_failed_write_is_retried(env, monkeypatch):
+    db_file, pending, graded = env
+    real, calls = storage.insert_submission, []
+
+    def flaky(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(submissions.storage, "insert_submission", flaky)
+    w = submissions._SubmissionWriter(pending)
+    receipt = w.enqueue(db_file, 1, 0.0, 60.0, 1.0, ANSWERS, TASKS)
+    assert w.flush(10)
+    _wait(lambda: not os.listdir(pending))
+    assert len(calls) == 2 and _rows(db_file, receipt) == 1 and len(graded) == 1
+
+
+def test_gives_up_and_keeps_journal(env, monkeypatch):
+    db_file, pending, graded = env
+    monkeypatch.setattr(submissions, "MAX_ATTEMPTS", 2)
+
+    def broken(*args, **kwargs):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(submissions.storage, "insert_submission", broken)
+    w = submissions._SubmissionWriter(pending)
+    receipt = w.enqueue(db_file, 1, 0.0, 60.0, 1.0, ANSWERS, TASKS)
+    assert w.flush(10)
+    assert os.path.exists(submissions._journal_path(receipt, pending))
+    assert w._failures[receipt] == 2 and w.recover() == 0   # no se reintenta hasta el próximo arranque
+    assert w.status(receipt, db_file)["estado"] == submissions.QUEUED
+
+
+def test_dead_pid_journal_recovered_exactly_once(env):
+    db_file, pending, graded = env
+    _journal(pending, "huerfano", db_file, _dead_pid())
+    w = submissions._SubmissionWriter(pending)   # la primera revisión corre al arrancar el hilo
+    _wait(lambda: not os.listdir(pending))
+    assert w.recover() == 0
+    assert submissions._SubmissionWriter(pending).flush(5)
+    assert _rows(db_file, "huerfano") == 1 and len(graded) == 1
+
+
+def test_live_foreign_journal_left_alone(env):
+    db_file, pending, graded = env
+    _journal(pending, "ajeno", db_file, os.getppid())
+    w = submissions._SubmissionWriter(pending)
+    assert w.recover() == 0 and w.flush(5)
+    assert _rows(db_file, "ajeno") == 0 and not graded
+
+
+def test_recovered_submission_not_duplicated(env):
+    # El proceso murió después de guardar la entrega y una de sus tareas
+    db_file, pending, graded = env
+    with storage.connection(db_file) as con:
+        sub_id = storage.insert_submission(con, 1, 0.0, 60.0, 1.0, ANSWERS, receipt="medias")
+        storage.insert_coding(con, sub_id, "PY", 301, 1, 1, "[]", 1.0)
+    _journal(pending, "medias", db_file, _dead_pid())
+    submissions._SubmissionWriter(pending)
+    _wait(lambda: not os.listdir(pending))
+    assert _rows(db_file, "medias") == 1
+    assert graded == [(sub_id, [501])]   # solo la tarea que faltaba
+
+
+def test_status_after_restart_counts_journal_tasks(env):
+    db_file, pending, graded = env
+    with storage.connection(db_file) as con:
+        sub_id = storage.insert_submission(con, 1, 0.0, 60.0, 1.0, ANSWERS, receipt="r1")
+        storage.insert_coding(con, sub_id, "PY", 301, 1, 1, "[]", 1.0)
+    _journal(pending, "r1", db_file, os.getppid())   # de otro proceso vivo: sigue calificando
+    w = submissions._SubmissionWriter(pending)   # sin estado en memoria
+    assert w.status("r1", db_file) == {"estado": submissions.PERSISTED, "submission_id": sub_id}
+    with storage.connection(db_file) as con:
+        storage.insert_coding(con, sub_id, "SQL", 501, 1, 1, "[]", 1.0)
+    assert w.status("r1", db_file)["estado"] == submissions.GRADED
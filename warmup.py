@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# Precalentamiento del proceso en un hilo de fondo.
+# El primer rerun lo lanza y sigue de largo: el título y el formulario de registro se dibujan sin
+# esperar a pandas, al banco ni a la base. El hilo compila/lee el banco (importa pandas) y lo registra
+# en la base (la primera conexión migra el esquema); eso es lo que la app espera con wait() antes de
+# la prueba. Después, sin que nadie espere, deja listos el pool de calificación, la plantilla SQL y la
+# cola de envíos.
+# Los reruns siguientes encuentran todo hecho: start() corre una sola vez por proceso (la app
+# igual vuelve a llamar a load_bank en cada rerun para notar si el Excel cambió).
+
+import threading, time
+
+import perf
+
+
+class _Warmup:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+        self._bank = None
+        self._error = None
+
+    def start(self, db_file: str, excel_file: str):
+        with self._lock:
+            # Tras un error (p. ej. falta el Excel) el siguiente rerun vuelve a intentarlo
+            if self._thread is None or (self._error is not None and self._ready.is_set()):
+                self._ready.clear()
+                self._error = None
+                self._thread = threading.Thread(target=self._run, args=(db_file, excel_file),
+                                                name="warmup", daemon=True)
+                self._thread.start()
+
+    def _run(self, db_file: str, excel_file: str):
+        t0 = time.perf_counter()
+        try:
+            import storage
+            with perf.timer("load_bank"):
+                import question_bank
+                bank = question_bank.load_bank(excel_file)
+            # La primera conexión del proceso migra el esquema
+            with perf.timer("db_connect"):
+                storage.register_bank(db_file, bank.version, excel_file)
+            self._bank = bank
+        except Exception as e:
+            self._error = e
+            return
+        finally:
+            perf.record("warmup.bank", time.perf_counter() - t0)
+            self._ready.set()
+        try:
+            # submissions: al importarse recupera diarios pendientes y arranca el hilo escritor
+            import grading, sandbox, sql_grader, submissions
+            sandbox.get_pool()
+            sql_grader.get_template(bank)
+        except Exception:
+            pass   # la calificación vuelve a intentarlo al primer envío
+        perf.record("warmup.graders", time.perf_counter() - t0)
+
+    def wait(self, timeout: float = None):
+        """Banco base compilado; propaga el error si no se pudo cargar."""
+        if not self._ready.wait(timeout):
+            raise TimeoutError("El precalentamiento no terminó a tiempo")
+        if self._error is not None:
+            raise self._error
+        return self._bank
+
+
+_warmup = _Warmup()
+
+start = _warmup.start
+wait = _warmup.wait